@@ -1,51 +1,41 @@
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QListWidget,
+from PyQt6.QtWidgets import (QApplication, QMainWindow,
                            QVBoxLayout, QPushButton, QWidget, QSystemTrayIcon, QMenu,
                            QHBoxLayout, QStackedWidget, QLabel, QTextEdit, QDialog, QLineEdit, QMessageBox, QComboBox, QInputDialog, QFrame, QScrollArea, QCheckBox,
                            QStyledItemDelegate, QStyle, QStyleOptionViewItem, QListView)
-from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal, QPoint, QRect, QSize, QAbstractNativeEventFilter
-from PyQt6.QtGui import QClipboard, QIcon, QKeyEvent, QKeySequence, QShortcut, QColor, QPen, QPalette
+from PyQt6.QtCore import (Qt, QTimer, QThread, pyqtSignal, QPoint, QRect, QSize, QAbstractNativeEventFilter,
+                          QAbstractListModel, QModelIndex, QMimeData, QByteArray)
+from PyQt6.QtGui import QClipboard, QIcon, QKeyEvent, QKeySequence, QShortcut, QColor, QPen, QPalette, QTextCursor
 import sys
 import json
 import os
 import keyboard
 import time
-import re
 import traceback
+import heapq
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
 import ctypes
 from ctypes import wintypes
 from pynput.keyboard import Key, Controller
 
 from d1_storage import D1Storage, load_env_file
+from clipboard_watch import create_backend, CapturePipeline, CaptureWorker, LargeClipboardText
+from clipboard_watch import win32_clipboard_text as _win_clipboard_text
+from history_index import HistoryIndex, HISTORY_MAX_ITEMS, content_key, entry_key
+from history_store import open_history_store
+from blob_store import BlobStore, BlobRef, BlobMissingError, same_content
+from write_behind import WriteBehindPersister
+from latency_metrics import LatencyRecorder
+from ngram_index import NgramIndex
+from search_worker import SearchWorker
+from query_matcher import QueryMatcher, FuzzyMatcher, NormalizedText, NormalizedCache
 
 import keyboard
 from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
 
 
-def _win_clipboard_text():
-    """用 Windows API 直接读取剪贴板里的 Unicode 文本（Qt 偶尔读不到他进程刚写入的内容时兜底）。"""
-    CF_UNICODETEXT = 13
-    u = ctypes.windll.user32
-    k = ctypes.windll.kernel32
-    if not u.OpenClipboard(0):
-        return None
-    try:
-        h = u.GetClipboardData(CF_UNICODETEXT)
-        if not h:
-            return ''
-        k.GlobalLock.restype = ctypes.c_void_p
-        k.GlobalLock.argtypes = [ctypes.c_void_p]
-        ptr = k.GlobalLock(h)
-        if not ptr:
-            return ''
-        try:
-            return ctypes.c_wchar_p(ptr).value
-        finally:
-            k.GlobalUnlock(h)
-    finally:
-        u.CloseClipboard()
-
-
 def _any_key_down():
     """检测键盘上是否还有任意按键（不含鼠标键）处于按下状态。"""
     try:
@@ -106,12 +96,15 @@ class GlobalHotkeyManager(QAbstractNativeEventFilter):
 
     热键消息(WM_HOTKEY)直接由 Qt 主线程的事件循环分发，通过本事件
     过滤器接收并派发，无需独立线程与底层键盘钩子，稳定可靠。
+    回调执行期间 current_dispatch 为 (热键名称, 派发时刻 perf_counter)，
+    供回调记录“按下热键到窗口画出”的延迟。
     """
 
     def __init__(self):
         super().__init__()
         self._user32 = ctypes.windll.user32
-        self._callbacks = {}   # hotkey_id -> callback
+        self._callbacks = {}   # hotkey_id -> (name, callback)
+        self.current_dispatch = None
         self._registry = {}    # name -> (hotkey_id, hotkey_str, callback)
         self._next_id = 1
 
@@ -133,7 +126,7 @@ class GlobalHotkeyManager(QAbstractNativeEventFilter):
             print(f"注册热键失败: {hotkey_str} (可能已被其它程序占用)")
             return False
 
-        self._callbacks[hotkey_id] = callback
+        self._callbacks[hotkey_id] = (name, callback)
         self._registry[name] = (hotkey_id, hotkey_str, callback)
         print(f"已注册全局热键: {name} -> {hotkey_str}")
         return True
@@ -158,9 +151,14 @@ class GlobalHotkeyManager(QAbstractNativeEventFilter):
         if eventType == b"windows_generic_MSG":
             msg = wintypes.MSG.from_address(int(message))
             if msg.message == WM_HOTKEY:
-                callback = self._callbacks.get(msg.wParam)
-                if callback:
-                    callback()
+                hit = self._callbacks.get(msg.wParam)
+                if hit:
+                    name, callback = hit
+                    self.current_dispatch = (name, time.perf_counter())
+                    try:
+                        callback()
+                    finally:
+                        self.current_dispatch = None
                     return True, 0
         return False, 0
 
@@ -405,7 +403,20 @@ class DescriptionDialog(QDialog):
         return self.description_edit.toPlainText()
 
 class PreviewWindow(QWidget):
-    """悬浮预览窗口"""
+    """悬浮预览窗口
+
+    按住方向键快速移动选中行时，原先每移动一行都要把整条内容 setPlainText 一遍。
+    现在经 request() 防抖：选中行停下 DEBOUNCE_MS 后才读取内容；首次只排版开头
+    INITIAL_CHARS 个字符，滚动到底部时再按 CHUNK_CHARS 追加；从外置存储读回的内容
+    放在一个按总字符数（CACHE_CHARS）限制的 LRU 里，相邻行的外置内容在后台线程
+    预取（读文件、解压都不在界面线程），上下来回移动时不再重复读取。
+    """
+    DEBOUNCE_MS = 80
+    INITIAL_CHARS = 20000
+    CHUNK_CHARS = 50000
+    CACHE_CHARS = 4 * 1024 * 1024
+    prefetched = pyqtSignal(int, object, object)   # (预取代号, 条目, 完整内容)，从预取线程发出
+
     def __init__(self, parent=None):
         super().__init__(parent, Qt.WindowType.Tool | Qt.WindowType.FramelessWindowHint)
         self.setStyleSheet("""
@@ -538,7 +549,13 @@ class PreviewWindow(QWidget):
         self.text_edit.setReadOnly(True)
         self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self.text_edit.verticalScrollBar().valueChanged.connect(self._maybe_load_more)
         container_layout.addWidget(self.text_edit)
+
+        # 只显示了部分内容时的提示
+        self.more_label = QLabel()
+        self.more_label.hide()
+        container_layout.addWidget(self.more_label)
         
         # 设置弹性空间
         container_layout.addStretch()
@@ -556,9 +573,142 @@ class PreviewWindow(QWidget):
             Qt.WindowType.FramelessWindowHint |
             Qt.WindowType.WindowStaysOnTopHint
         )
-    
+
+        self._text = ""           # 当前条目的完整内容
+        self._shown = 0           # 已放入 text_edit 的字符数
+        self._cache = OrderedDict()   # id(entry) -> (entry, 完整内容)，只存读回的外置内容
+        self._cache_chars = 0     # 缓存中内容的总字符数
+        self._pending = None      # 等待防抖结束的请求
+        self._prefetch_generation = 0   # 每次新请求加一，旧的预取线程据此提前结束
+        self.prefetched.connect(self._on_prefetched)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DEBOUNCE_MS)
+        self._timer.timeout.connect(self._load_pending)
+
+    def request(self, entry, resolve, description, anchor, neighbours=()):
+        """防抖地预览 entry：resolve(entry) -> 完整内容，在选中行停下后才调用。
+
+        anchor 为预览窗口停靠的窗口；neighbours 为相邻行的条目，显示后空闲时预取。
+        预览窗口还没显示时立即加载，不等防抖。
+        """
+        self._pending = (entry, resolve, description, anchor, list(neighbours))
+        self._prefetch_generation += 1
+        if self.isVisible():
+            self._timer.start()
+        else:
+            self._timer.stop()
+            self._load_pending()
+
+    def cancel(self):
+        """丢弃尚未加载的请求并隐藏窗口。"""
+        self._timer.stop()
+        self._pending = None
+        self._prefetch_generation += 1
+        self.hide()
+
+    def _cached(self, entry):
+        hit = self._cache.get(id(entry))
+        if hit is not None and hit[0] is entry:
+            self._cache.move_to_end(id(entry))
+            return hit[1]
+        return None
+
+    def _store(self, entry, text):
+        # 本来就在内存中的 str 不必缓存；单条超过上限的内容也不缓存
+        if text is entry or len(text) > self.CACHE_CHARS:
+            return
+        old = self._cache.pop(id(entry), None)
+        if old is not None:
+            self._cache_chars -= len(old[1])
+        self._cache[id(entry)] = (entry, text)
+        self._cache_chars += len(text)
+        while self._cache_chars > self.CACHE_CHARS:
+            _, (_, dropped) = self._cache.popitem(last=False)
+            self._cache_chars -= len(dropped)
+
+    def _fetch(self, entry, resolve):
+        text = self._cached(entry)
+        if text is None:
+            text = resolve(entry)
+            self._store(entry, text)
+        return text
+
+    def _load_pending(self):
+        if self._pending is None:
+            return
+        entry, resolve, description, anchor, neighbours = self._pending
+        self._pending = None
+        if not anchor.isVisible():
+            return
+        try:
+            self.set_content(self._fetch(entry, resolve), description)
+            self.show_beside(anchor)
+        except Exception as e:
+            print(f"预览显示错误: {e}")
+            self.hide()
+            return
+        # 只有外置的大内容需要读文件、解压，放到后台线程预取
+        todo = [e for e in neighbours if isinstance(e, BlobRef) and self._cached(e) is None]
+        if todo:
+            threading.Thread(target=self._prefetch_worker,
+                             args=(todo, resolve, self._prefetch_generation), daemon=True).start()
+
+    def _prefetch_worker(self, entries, resolve, generation):
+        """预取线程：逐条读回内容，交回界面线程放入缓存；有新请求时提前结束。"""
+        for entry in entries:
+            if generation != self._prefetch_generation:
+                return
+            try:
+                text = resolve(entry)
+            except Exception as e:
+                print(f"预取预览内容失败: {e}")
+                continue
+            self.prefetched.emit(generation, entry, text)
+
+    def _on_prefetched(self, generation, entry, text):
+        if generation == self._prefetch_generation:
+            self._store(entry, text)
+
+    def show_beside(self, anchor):
+        """停靠在 anchor 右侧（超出屏幕时放到左侧）并显示；位置不变时不移动。"""
+        screen = QApplication.primaryScreen().geometry()
+        preview_width = self.width()
+        ideal_x = anchor.x() + anchor.width() + 10
+        if ideal_x + preview_width > screen.right():
+            preview_x = anchor.x() - preview_width - 10
+        else:
+            preview_x = ideal_x
+        if self.pos() != QPoint(preview_x, anchor.y()):
+            self.move(preview_x, anchor.y())
+        if not self.isVisible():
+            self.show()
+
+    def _update_more_label(self):
+        if self._shown < len(self._text):
+            self.more_label.setText(f"已显示 {self._shown} / {len(self._text)} 字符，滚动到底部加载更多")
+            self.more_label.show()
+        else:
+            self.more_label.hide()
+
+    def _maybe_load_more(self, value):
+        """滚动到 text_edit 底部时追加下一段内容。"""
+        bar = self.text_edit.verticalScrollBar()
+        if self._shown >= len(self._text) or value < bar.maximum():
+            return
+        chunk = self._text[self._shown:self._shown + self.CHUNK_CHARS]
+        self._shown += len(chunk)
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(chunk)
+        self._update_more_label()
+
     def set_content(self, text, description=""):
-        self.text_edit.setPlainText(text)
+        # 只排版开头一段，其余在滚动到底部时再追加
+        self._text = text
+        self._shown = min(len(text), self.INITIAL_CHARS)
+        self.text_edit.setPlainText(text[:self._shown])
+        self._update_more_label()
         if description:
             self.description_label.show()
             self.description_edit.show()
@@ -682,7 +832,14 @@ class EditItemDialog(QDialog):
         return self.text_edit.toPlainText()
 
 class SearchDialog(QDialog):
-    """搜索对话框"""
+    """搜索对话框
+
+    搜索在 SearchWorker 的后台线程中进行：每次输入作废上一次查询，结果经
+    results_found 信号分批回到界面线程追加到列表，输入框始终不被搜索阻塞。
+    """
+    results_found = pyqtSignal(int, object, bool)   # (查询代号, 一批结果, 是否结束)
+    search_failed = pyqtSignal(int, str)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("搜索")
@@ -729,6 +886,11 @@ class SearchDialog(QDialog):
         self.whole_word_checkbox = QCheckBox("全字匹配(&W)")
         self.whole_word_checkbox.stateChanged.connect(self.on_search_option_changed)
         options_layout.addWidget(self.whole_word_checkbox)
+
+        # 模糊排序选项 - Alt+F：按子序列模糊匹配并按得分排序（忽略正则与全字匹配）
+        self.fuzzy_checkbox = QCheckBox("模糊排序(&F)")
+        self.fuzzy_checkbox.stateChanged.connect(self.on_search_option_changed)
+        options_layout.addWidget(self.fuzzy_checkbox)
         
         layout.addLayout(options_layout)
         
@@ -762,9 +924,11 @@ class SearchDialog(QDialog):
         # 创建水平分割布局
         split_layout = QHBoxLayout()
         
-        # 结果列表
-        self.results_list = QListWidget()
-        self.results_list.itemDoubleClicked.connect(self.use_selected)
+        # 结果列表：模型直接以 self.results 为数据，只为可见行生成显示片段
+        self.results_model = SearchResultsModel(self)
+        self.results_list = FullWidthListView()
+        self.results_list.setModel(self.results_model)
+        self.results_list.doubleClicked.connect(self.use_selected)
         self.results_list.currentItemChanged.connect(self.show_preview)
         # 设置右键菜单
         self.results_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -775,6 +939,16 @@ class SearchDialog(QDialog):
         
         # 存储搜索结果
         self.results = []  # 确保初始化 results 列表
+
+        # 后台搜索：只有最新查询（代号）的结果会被显示
+        self.results_found.connect(self._on_results_found)
+        self.search_failed.connect(self._on_search_failed)
+        self.search_worker = SearchWorker(self.results_found.emit, lambda gen, e: self.search_failed.emit(gen, str(e)))
+        # 每个对话框一个后台线程：对话框关闭（WA_DeleteOnClose）或被销毁时让它退出
+        worker = self.search_worker
+        self.destroyed.connect(lambda: worker.stop())
+        self._search_generation = 0   # 最新一次查询的代号
+        self._shown_generation = 0    # 结果列表当前显示的是哪次查询
         
         # 创建预览窗口但不显示
         self.preview_window = PreviewWindow()
@@ -838,9 +1012,6 @@ class SearchDialog(QDialog):
         if current_item:
             index = self.results_list.currentRow()
             if 0 <= index < len(self.results):
-                # 使用元组解包，并为可能缺失的值提供默认值
-                source, text, description = (*self.results[index], "", "", "")[:3]
-
                 # 添加编辑选项
                 edit_action = menu.addAction("编辑内容和描述(&E)")  # Alt+E
                 delete_action = menu.addAction("删除(&D)")  # Alt+D
@@ -855,7 +1026,7 @@ class SearchDialog(QDialog):
                     move_action.triggered.connect(make_move_handler(folder, index))
                 
                 # 获取当前条目的矩形区域
-                item_rect = self.results_list.visualItemRect(current_item)
+                item_rect = self.results_list.visualRect(current_item)
                 # 将条目的位置转换为全局坐标，并稍微向下偏移
                 global_pos = self.results_list.mapToGlobal(item_rect.bottomLeft())
                 # 调整菜单显示位置，使其紧贴条目下方
@@ -871,40 +1042,37 @@ class SearchDialog(QDialog):
     def move_to_folder_from_results(self, index, target_folder):
         """将搜索结果中的条目移动到指定收藏夹"""
         if 0 <= index < len(self.results):
-            source, text, description = (*self.results[index], "", "", "")[:3]
+            source, entry, description, _, key = self.results[index]
 
             # 确保目标收藏夹存在
             if target_folder not in self.parent_app.favorites:
                 self.parent_app.favorites[target_folder] = []
             
-            # 创建新的收藏项
-            new_item = {"text": text, "description": description}
+            # 创建新的收藏项（条目本身已是 str 或外置的 BlobRef，不必读回全文）
+            new_item = {"text": entry, "description": description}
             
-            # 添加到目标收藏夹
-            self.parent_app.favorites[target_folder].append(new_item)
+            # 添加到目标收藏夹（正在显示时列表同步增加一行）
+            target_items = self.parent_app.favorites[target_folder]
+            self.parent_app.insert_entry(target_items, len(target_items), new_item)
             
             # 如果源是收藏夹，从原收藏夹中移除
             if source.startswith("收藏夹-"):
                 original_folder = source[4:]  # 去掉"收藏夹-"前缀
                 if original_folder in self.parent_app.favorites:
                     for i, item in enumerate(self.parent_app.favorites[original_folder]):
-                        if isinstance(item, dict) and item["text"] == text:
-                            self.parent_app.favorites[original_folder].pop(i)
+                        if isinstance(item, dict) and same_content(item["text"], entry):
+                            self.parent_app.pop_entry(self.parent_app.favorites[original_folder], i)
                             break
             # 如果源是历史记录，从历史记录中移除
             elif source == "历史记录":
-                if text in self.parent_app.clipboard_history:
-                    self.parent_app.clipboard_history.remove(text)
-                    self.parent_app.save_history()
+                row = self.parent_app.clipboard_history.row_of_key(key)
+                if row is not None:
+                    self.parent_app.pop_entry(self.parent_app.clipboard_history, row)
+                self.parent_app.history_store.record_delete(entry)
             
             # 保存更改
             self.parent_app.save_favorites()
             
-            # 更新显示
-            if self.parent_app.current_folder == target_folder:
-                truncated_text = self.parent_app.truncate_text(text)
-                self.parent_app.favorites_list.addItem(f"{len(self.parent_app.favorites[target_folder])}. {truncated_text}")
-            
             QMessageBox.information(self, "移动成功", f"已移动到收藏夹: {target_folder}")
     
 
@@ -912,10 +1080,11 @@ class SearchDialog(QDialog):
         """删除选中的搜索结果项，并从原始数据源中删除"""
         index = self.results_list.currentRow()
         if 0 <= index < len(self.results):
-            source, text, description = self.results[index]
+            source, entry, description, _, key = self.results[index]
             
-            # 截断显示的文本
-            truncated_text = text[:50] + ('...' if len(text) > 50 else '')
+            # 截断显示的文本（外置的大内容只用其预览，不为确认框读回全文）
+            text = entry.preview if isinstance(entry, BlobRef) else entry
+            truncated_text = text[:50] + ('...' if len(entry) > 50 else '')
             
             # 确认删除 - 使用正确的按钮类型
             reply = QMessageBox.question(
@@ -940,26 +1109,22 @@ class SearchDialog(QDialog):
                     if folder_name in parent.favorites:
                         # 遍历收藏夹中的项目
                         for i, item in enumerate(parent.favorites[folder_name]):
-                            if isinstance(item, dict) and item["text"] == text:
-                                # 从收藏夹数据中删除
-                                parent.favorites[folder_name].pop(i)
+                            if isinstance(item, dict) and same_content(item["text"], entry):
+                                # 从收藏夹数据中删除（正在显示时列表同步删除该行）
+                                parent.pop_entry(parent.favorites[folder_name], i)
                                 parent.save_favorites()
-                                
-                                # 如果当前显示的是该收藏夹，更新 UI
-                                if parent.current_folder == folder_name:
-                                    parent.favorites_list.takeItem(i)
-                                    parent.update_list_numbers(parent.favorites_list)
                                 break
                 elif source == "历史记录":
-                    # 在历史记录中查找并删除
-                    for i, history_text in enumerate(parent.clipboard_history):
-                        if history_text == text:
-                            # 从历史记录中删除
-                            deleted_item = parent.clipboard_history.pop(i)
-                            parent.delete_history.append(deleted_item)
-                            parent.update_history_list()
-                            parent.save_history()
-                            break
+                    # 在历史记录中查找并删除（按内容哈希定位）
+                    row = parent.clipboard_history.row_of_key(key)
+                    if row is not None:
+                        # 从历史记录中删除（列表同步删除该行）
+                        deleted_item = parent.pop_entry(parent.clipboard_history, row)
+                        parent.history_store.record_delete(deleted_item)
+                        parent.delete_history.append(deleted_item)
+                    else:
+                        # 只在存储中的旧条目（SQLite 全文索引命中、已不在内存历史里）：直接按内容哈希删除
+                        parent.history_store.record_delete(entry)
                 
                 print(f"已从{source}中删除项目")
 
@@ -967,8 +1132,10 @@ class SearchDialog(QDialog):
         """编辑选中的搜索结果项"""
         index = self.results_list.currentRow()
         if 0 <= index < len(self.results):
-            # 解包三个值
-            source, text, description = self.results[index]
+            source, entry, description, _, key = self.results[index]
+            text = self._result_text(index)
+            if text is None:
+                return
             
             # 创建编辑对话框
             dialog = DescriptionDialog(self, text=text, description=description)
@@ -985,16 +1152,18 @@ class SearchDialog(QDialog):
                 
                 # 更新内容
                 if source == "历史记录":
-                    # 更新历史记录
-                    self.parent_app.clipboard_history[index] = new_content
-                    self.parent_app.save_history()
-                    
-                    # 更新显示
-                    truncated_text = self.parent_app.truncate_text(new_content)
-                    self.parent_app.history_list.item(index).setText(f"{index+1}. {truncated_text}")
+                    # 更新历史记录（按内容找到它在历史中的行，搜索结果的行号不是历史行号）
+                    history = self.parent_app.clipboard_history
+                    new_entry = self.parent_app.blob_store.externalize(new_content)
+                    row = history.row_of_key(key)
+                    if row is not None:
+                        self.parent_app.replace_entry(history, row, new_entry)
+                    # 只在存储中的旧条目同样按原内容的哈希改写存储
+                    self.parent_app.history_store.record_edit(entry, new_entry)
                     
-                    # 更新搜索结果
-                    self.results[index] = (source, new_content, "")
+                    # 更新搜索结果（只重绘这一行）
+                    self.results[index] = (source, new_entry, "", None, entry_key(new_entry))
+                    self.results_model.refresh(index)
                     
                 elif source.startswith("收藏夹-"):
                     folder_name = source[4:]  # 提取收藏夹名称
@@ -1006,25 +1175,22 @@ class SearchDialog(QDialog):
                         
                         # 查找原始项目的索引
                         for i, item in enumerate(existing_items):
-                            if isinstance(item, dict) and item["text"] == text:
+                            if isinstance(item, dict) and same_content(item["text"], entry):
                                 found_index = i
                                 break
                         
                         if found_index is not None:
                             # 更新现有项目
                             new_item = {
-                                "text": new_content,
+                                "text": self.parent_app.blob_store.externalize(new_content),
                                 "description": new_description
                             }
-                            self.parent_app.favorites[folder_name][found_index] = new_item
-                            
-                            # 如果当前显示的是该收藏夹，更新显示
-                            if self.parent_app.current_folder == folder_name:
-                                truncated_text = self.parent_app.truncate_text(new_content)
-                                self.parent_app.favorites_list.item(found_index).setText(f"{found_index+1}. {truncated_text}")
+                            # 正在显示该收藏夹时列表同步重绘这一行
+                            self.parent_app.replace_entry(existing_items, found_index, new_item)
                             
                             # 更新搜索结果
-                            self.results[index] = (source, new_content, new_description)
+                            self.results[index] = (source, new_item["text"], new_description, None,
+                                                   entry_key(new_item["text"]))
                             
                             # 立即保存更改
                             self.parent_app.save_favorites()
@@ -1043,12 +1209,13 @@ class SearchDialog(QDialog):
             if self.results_list.currentRow() >= 0:
                 index = self.results_list.currentRow()
                 if 0 <= index < len(self.results):
-                    # 修改这里：只解包三个值
-                    source, text, description = self.results[index]
+                    text = self._result_text(index)
+                    if text is None:
+                        return
                     try:
                         
-                        # 设置新的剪贴板内容
-                        QApplication.clipboard().setText(text)
+                        # 设置新的剪贴板内容（放到历史最前，自身写入不再触发捕获）
+                        self._copy_result(index, text)
                         
                         # 隐藏对话框
                         self.hide()
@@ -1075,12 +1242,25 @@ class SearchDialog(QDialog):
         """复制选中项到剪贴板"""
         index = self.results_list.currentRow()
         if 0 <= index < len(self.results):
-            # 修改这里：只解包三个值
-            source, text, description = self.results[index]
-            QApplication.clipboard().setText(text)
+            text = self._result_text(index)
+            if text is None:
+                return
+            self._copy_result(index, text)
             # 显示复制成功提示
             QMessageBox.information(self, "复制成功", "文本已复制到剪贴板")
     
+    def _result_text(self, index):
+        """第 index 个结果的完整文本：外置的大内容在这里才读回，读不回时提示并返回 None"""
+        try:
+            return self.parent_app._entry_text(self.results[index][1])
+        except BlobMissingError as e:
+            self.parent_app._warn_missing_blob(e)
+            return None
+
+    def _copy_result(self, index, text):
+        """把第 index 个结果（完整文本为 text）写入剪贴板：经主窗口放到历史最前，并标记为自身写入"""
+        self.parent_app.copy_to_clipboard(self.results[index][1], text)
+
     def on_search_text_changed(self):
         """搜索文本变化时触发搜索"""
         self.perform_search()
@@ -1095,35 +1275,47 @@ class SearchDialog(QDialog):
         use_regex = self.regex_checkbox.isChecked()
         case_sensitive = self.case_sensitive_checkbox.isChecked()
         whole_word = self.whole_word_checkbox.isChecked()
+        fuzzy = self.fuzzy_checkbox.isChecked()
         scope = self.scope_combo.currentText()
         
-        # 如果搜索文本为空，清空结果
+        # 如果搜索文本为空，作废进行中的搜索并清空结果
         if not search_text:
+            self.search_worker.cancel()
+            self._search_generation = self._shown_generation = self.search_worker.generation
             self.results = []
             self.fill_results()
             return
         
-        # 执行搜索
-        try:
-            self.results = self.parent_app.search_items(
-                search_text, use_regex, scope, case_sensitive, whole_word
-            )
-            self.fill_results()
-        except Exception as e:
-            QMessageBox.warning(self, "搜索错误", f"搜索时发生错误: {str(e)}")
+        # 在界面线程取好数据快照，交给后台线程搜索；旧列表保留到新结果到来
+        app = self.parent_app
+        snapshot = app.search_snapshot(scope)
+        self._search_generation = self.search_worker.submit(
+            lambda cancelled: app.iter_search(search_text, use_regex, scope, case_sensitive,
+                                              whole_word, fuzzy, snapshot=snapshot, cancelled=cancelled))
+
+    def _on_results_found(self, generation, batch, done):
+        """后台搜索交来一批结果（界面线程）：过期查询的直接丢弃"""
+        if generation != self._search_generation:
+            return
+        if generation != self._shown_generation:
+            # 新查询的第一批：换掉上一次的结果
+            self._shown_generation = generation
+            self.results = []
+            self.results_model.set_results(self.results)
+        first = len(self.results)
+        if batch:
+            with self.results_model.inserting(first, first + len(batch) - 1):
+                self.results.extend(batch)
+        if first == 0 and self.results_list.count() > 0:
+            self.results_list.setCurrentRow(0)
+
+    def _on_search_failed(self, generation, message):
+        if generation == self._search_generation:
+            QMessageBox.warning(self, "搜索错误", f"搜索时发生错误: {message}")
     
     def fill_results(self):
-        """填充搜索结果列表"""
-        self.results_list.clear()
-        
-        for i, (source, text, description) in enumerate(self.results):
-            # 构建显示文本
-            display_text = f"{i+1}. [{source}] {text}"
-            if description:
-                display_text += " [有描述]"
-            
-            # 添加到结果列表
-            self.results_list.addItem(display_text)
+        """结果列表整体换成 self.results（删除、编辑结果后调用）：一次模型重置"""
+        self.results_model.set_results(self.results)
         
         # 如果有结果，选中第一项
         if self.results_list.count() > 0:
@@ -1133,17 +1325,21 @@ class SearchDialog(QDialog):
         """使用选中的搜索结果"""
         index = self.results_list.currentRow()
         if 0 <= index < len(self.results):
-            text = self.results[index][0]
-            QApplication.clipboard().setText(text)
+            text = self._result_text(index)
+            if text is None:
+                return
+            self._copy_result(index, text)
             self.accept()  # 关闭对话框
     
     def closeEvent(self, event):
         """关闭事件处理"""
+        self.search_worker.stop()
         self.preview_window.hide()
         event.accept()
     
     def reject(self):
         """取消对话框"""
+        self.search_worker.stop()
         self.preview_window.hide()
         super().reject()
     
@@ -1163,31 +1359,6 @@ class SearchDialog(QDialog):
         
         return super().eventFilter(obj, event)
 
-    def paste_selected(self):
-        """将选中的项目粘贴到当前活动窗口"""
-        index = self.results_list.currentRow()
-        if 0 <= index < len(self.results):
-            # 修改这里：只解包三个值
-            source, text, description = self.results[index]
-            print(f"index: {index}")
-            print(f"self.results[index]: {self.results[index]}")
-            print(f"source: {source}, text: {text}, description: {description}")    
-            try:
-                # 保存当前剪贴板内容
-                old_clipboard = QApplication.clipboard().text()
-                
-                # 设置新的剪贴板内容
-                QApplication.clipboard().setText(text)
-                
-                # 隐藏对话框
-                self.hide()
-                
-                # 等待一小段时间确保对话框已关闭
-                QTimer.singleShot(50, lambda: self._do_paste(old_clipboard))
-                
-            except Exception as e:
-                print(f"粘贴时出错: {e}")
-
     def _do_paste(self, old_clipboard):
         """执行实际的粘贴操作并恢复剪贴板"""
         try:
@@ -1195,7 +1366,7 @@ class SearchDialog(QDialog):
             keyboard.press_and_release('ctrl+v')
             
             # 短暂延迟后恢复原剪贴板内容
-            QTimer.singleShot(100, lambda: QApplication.clipboard().setText(old_clipboard))
+            QTimer.singleShot(100, lambda: self.parent_app.set_clipboard_text(old_clipboard))
             
         except Exception as e:
             print(f"执行粘贴操作时出错: {e}")
@@ -1204,7 +1375,7 @@ class SearchDialog(QDialog):
     def show_preview(self, current, previous):
         """显示选中搜索结果的预览"""
         if not current:
-            self.preview_window.hide()
+            self.preview_window.cancel()
             return
         
         # 只有当搜索对话框可见时才显示预览窗口
@@ -1216,101 +1387,444 @@ class SearchDialog(QDialog):
         try:
             if 0 <= current_row < len(self.results):
                 # 从搜索结果中获取数据
-                source, text, description = self.results[current_row]
-                
-                # 显示预览窗口
-                self.preview_window.set_content(text, description)
-                
-                # 计算预览窗口的位置
-                screen = QApplication.primaryScreen().geometry()
-                preview_width = self.preview_window.width()
-                
-                # 计算预览窗口的理想x坐标
-                ideal_x = self.x() + self.width() + 10
-                
-                # 如果预览窗口会超出屏幕右边界，则将其放在对话框左侧
-                if ideal_x + preview_width > screen.right():
-                    preview_x = self.x() - preview_width - 10
-                else:
-                    preview_x = ideal_x
-                
-                preview_y = self.y()
-                
-                self.preview_window.move(preview_x, preview_y)
-                self.preview_window.show()
+                source, entry, description = self.results[current_row][:3]
+                neighbours = [self.results[r][1] for r in (current_row + 1, current_row - 1)
+                              if 0 <= r < len(self.results)]
+                # 外置的大内容防抖后才读回，显示在对话框旁边
+                self.preview_window.request(entry, self.parent_app._display_text, description,
+                                            self, neighbours)
         except Exception as e:
             print(f"搜索预览显示错误: {e}")
             self.preview_window.hide()
     
 
 
-class FullWidthListWidget(QListWidget):
-    """条目始终占满视口宽度的列表。
+# 列表预览最多保留的字符数：足够占满宽屏上的一整行，其余部分由代理省略显示
+LIST_PREVIEW_CHARS = 300
+
+
+def single_line_preview(text, max_length=LIST_PREVIEW_CHARS):
+    """文本 -> 有长度上限的单行预览。
+
+    只处理开头 max_length 个字符（换行变空格、去掉回车），被截断时末尾固定加“…”，
+    所以预览的长度与原文大小无关，同一段文本总得到同样的预览。
+    """
+    if len(text) <= max_length:
+        return text.replace('\n', ' ').replace('\r', '')
+    return text[:max_length].replace('\n', ' ').replace('\r', '') + '…'
+
+
+def match_snippet(text, span, max_length=120, before=30):
+    """命中位置附近的单行片段：从命中处前 before 个字符起取 max_length 个字符。
+
+    span 为命中的 (start, end)，为 None 时从开头取；前后被截掉时加“…”。
+    只处理片段本身，耗时与原文大小无关。
+    """
+    start = max(0, span[0] - before) if span else 0
+    snippet = single_line_preview(text[start:start + max_length + 1], max_length)
+    return ('…' + snippet) if start > 0 else snippet
+
+
+def list_number_prefix(row):
+    """行号 -> 列表编号前缀（与 try_jump_to_item 的输入方式对应）。
+
+    1-9 直接为 "n. "；10 及以上按十位数加点号：10-19 为 ".1x. "，20-29 为 "..2x. "，以此类推。
+    """
+    number = row + 1
+    if number <= 9:
+        return f"{number}. "
+    return f"{'.' * (number // 10)}{number}. "
+
+
+class EntryListModel(QAbstractListModel):
+    """直接以数据列表为后端的列表模型（历史记录用 clipboard_history，收藏夹用 favorites[folder]）。
+
+    原先每条记录都对应一个 QListWidgetItem，保存一份整行文本，切换收藏夹、加载历史
+    时要逐条重建。现在模型不保存任何副本：视图只在绘制可见行时通过 data() 按需生成
+    显示文本 display(entry)；编号不属于数据，由 ListItemDelegate 绘制时按行号加上。
+    增删改由调用方在 inserting()/removing()/moving() 中完成，模型只转发对应的增量通知。
+    """
+    EntryRole = Qt.ItemDataRole.UserRole
+    MIME_TYPE = 'application/x-clipboard-history-row'
+
+    def __init__(self, entries=None, display=str, movable=False, parent=None):
+        super().__init__(parent)
+        self._entries = entries if entries is not None else []
+        self._display = display      # display(entry) -> 单行显示文本
+        self._movable = movable      # 是否允许拖放调整顺序
+
+    def entries(self):
+        return self._entries
+
+    def set_entries(self, entries):
+        """换成另一份数据（如切换收藏夹）：一次模型重置，不逐行处理。"""
+        self.beginResetModel()
+        self._entries = entries
+        self.endResetModel()
+
+    # ---------- QAbstractListModel 接口 ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = index.row()
+        if not index.isValid() or not 0 <= row < len(self._entries):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._display(self._entries[row])
+        if role == self.EntryRole:
+            return self._entries[row]
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if self._movable:
+            if index.isValid():
+                flags |= Qt.ItemFlag.ItemIsDragEnabled
+            else:
+                flags |= Qt.ItemFlag.ItemIsDropEnabled
+        return flags
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        # 拖放只在列表内部移动，带上行号即可（默认实现会尝试序列化 Python 对象）
+        mime = QMimeData()
+        rows = ",".join(str(i.row()) for i in indexes)
+        mime.setData(self.MIME_TYPE, QByteArray(rows.encode()))
+        return mime
+
+    # ---------- 增量通知：在 with 块内修改数据 ----------
+    @contextmanager
+    def inserting(self, first, last=None):
+        self.beginInsertRows(QModelIndex(), first, first if last is None else last)
+        try:
+            yield
+        finally:
+            self.endInsertRows()
+
+    @contextmanager
+    def removing(self, first, last=None):
+        self.beginRemoveRows(QModelIndex(), first, first if last is None else last)
+        try:
+            yield
+        finally:
+            self.endRemoveRows()
+
+    @contextmanager
+    def moving(self, src, dst):
+        """把第 src 行移到第 dst 行（dst 为移动完成后的行号）。"""
+        # Qt 的目标位置是“插到哪一行之前”，向下移动时要加 1
+        moved = src != dst and self.beginMoveRows(
+            QModelIndex(), src, src, QModelIndex(), dst + 1 if dst > src else dst)
+        try:
+            yield
+        finally:
+            if moved:
+                self.endMoveRows()
+
+    @contextmanager
+    def resetting(self):
+        self.beginResetModel()
+        try:
+            yield
+        finally:
+            self.endResetModel()
+
+    def refresh(self, first=0, last=None):
+        """数据原地改变（如编辑内容）后通知视图重绘这些行。"""
+        if last is None:
+            last = len(self._entries) - 1
+        if 0 <= first <= last:
+            self.dataChanged.emit(self.index(first), self.index(last))
+
 
-    QListWidget 默认按内容宽度排布条目，且在窗口显示/缩放后不会主动重新向
-    delegate 查询 sizeHint，导致 delegate 返回的“视口宽度”无法生效（本程序
-    窗口初始 hide() 且列表位于 QStackedWidget 中，初次布局时视口宽度还不正
-    确）。这里直接给每个 QListWidgetItem 设置宽度——条目自身 sizeHint 的宽度
-    一定会被视图采纳，最为可靠——并在显示/缩放/新增条目时刷新。
+class SearchResultsModel(EntryListModel):
+    """搜索结果模型：数据就是对话框的 results 列表，只保存结果元组的引用。
+
+    原先每次搜索都要为每个结果建一个 QListWidgetItem，里面是包含整段内容的显示
+    文本。现在显示文本只在绘制可见行时生成："序号. [来源] 命中附近的片段"，片段
+    长度有上限（见 match_snippet）；命中位置由搜索线程随结果给出，绘制时不再扫描
+    内容。外置的大内容（BlobRef）只用其预览，不为显示读回全文。生成过的行缓存起来，
+    结果整体替换时清空。
     """
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self._rows = {}         # 行号 -> 显示文本
+
+    def set_results(self, results):
+        """换成新的结果列表（一次重置）。"""
+        self._rows = {}
+        self.set_entries(results)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = index.row()
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid() or not 0 <= row < len(self._entries):
+            return super().data(index, role)
+        text = self._rows.get(row)
+        if text is None:
+            source, content, description, span, _ = self._entries[row]
+            if isinstance(content, BlobRef):
+                # 命中处超出预览范围时从开头显示
+                preview = content.preview
+                snippet = match_snippet(preview, span if span and span[1] <= len(preview) else None) + '…'
+            else:
+                snippet = match_snippet(content, span)
+            text = f"{row + 1}. [{source}] {snippet}"
+            if description:
+                text += " [有描述]"
+            self._rows[row] = text
+        return text
+
+    def refresh(self, first=0, last=None):
+        """结果被原地编辑后丢弃已生成的显示文本并重绘"""
+        self._rows = {}
+        super().refresh(first, last)
+
+
+class FolderDisplayCache:
+    """收藏夹的显示缓存：每个收藏夹一份，保存各条目规整后的单行内容与单行描述。
+
+    原先代理每次绘制每一行都要按行号取收藏条目、对描述做两次 replace。现在每个条目
+    只规整一次，之后代理只读缓存。收藏夹按其 list 对象区分（重命名不影响），条目按
+    对象本身区分，所以移动条目无需任何更新；新增、删除、编辑由各修改路径调用
+    update()/discard() 增量维护。
+    """
+
+    def __init__(self, normalize):
+        self._normalize = normalize   # normalize(item) -> (单行内容, 单行描述)
+        self._folders = {}            # id(list) -> (list, {id(item): (item, 内容, 描述)})
+
+    def _rows(self, entries):
+        folder = self._folders.get(id(entries))
+        if folder is None or folder[0] is not entries:
+            folder = (entries, {})
+            self._folders[id(entries)] = folder
+        return folder[1]
+
+    def get(self, entries, item):
+        """返回 (单行内容, 单行描述)；第一次遇到该条目时才规整。"""
+        rows = self._rows(entries)
+        hit = rows.get(id(item))
+        if hit is None or hit[0] is not item:
+            hit = (item,) + self._normalize(item)
+            rows[id(item)] = hit
+        return hit[1], hit[2]
+
+    def update(self, entries, item):
+        """条目新增或被编辑后重新规整。"""
+        self._rows(entries)[id(item)] = (item,) + self._normalize(item)
+
+    def discard(self, entries, item):
+        self._rows(entries).pop(id(item), None)
+
+    def drop(self, entries):
+        """收藏夹被删除时丢弃它的整份缓存。"""
+        self._folders.pop(id(entries), None)
+
+    def clear(self):
+        self._folders.clear()
+
+
+class FolderModelCache:
+    """收藏夹的常驻列表模型：每个收藏夹一份 EntryListModel，连同它在视图中的选择模型。
+
+    原先切换收藏夹（下拉框切换、在历史面板按 → 回到收藏面板）都要把模型整个重置，
+    视图随之重新排版、丢掉当前行。现在每个收藏夹的模型创建后一直保留，切换时视图
+    只换一个模型（并换回该收藏夹之前的选择模型），耗时与收藏夹大小无关。模型之后由
+    各修改路径经 inserting()/removing()/moving() 增量通知，不会因切换而重建。
+    收藏夹同样按其 list 对象区分（重命名不影响）。
+    释放模型前先调用 detach(model)，视图正显示它时由调用方换下，视图不会留着已释放的模型。
+    """
+
+    def __init__(self, create, detach):
+        self._create = create   # create(entries) -> EntryListModel
+        self._detach = detach   # detach(model)：视图正显示 model 时把它换下
+        self._folders = {}      # id(list) -> [list, 模型, 选择模型或 None]
+
+    def get(self, entries):
+        """返回该收藏夹的模型，第一次访问时创建。"""
+        folder = self._folders.get(id(entries))
+        if folder is None or folder[0] is not entries:
+            folder = [entries, self._create(entries), None]
+            self._folders[id(entries)] = folder
+        return folder[1]
+
+    def find(self, entries):
+        """已创建的模型，没有时返回 None（不创建）。"""
+        folder = self._folders.get(id(entries))
+        return folder[1] if folder is not None and folder[0] is entries else None
+
+    def _folder_of(self, model):
+        for folder in self._folders.values():
+            if folder[1] is model:
+                return folder
+        return None
+
+    def selection(self, model):
+        """视图上次显示该模型时的选择模型（含当前行），没有时返回 None。"""
+        folder = self._folder_of(model)
+        return folder[2] if folder is not None else None
+
+    def keep_selection(self, model, selection):
+        """视图换走 model 前保存它的选择模型；model 已不在缓存中时直接释放。"""
+        folder = self._folder_of(model)
+        if folder is None:
+            selection.deleteLater()
+        else:
+            folder[2] = selection
+
+    def _release(self, folder):
+        self._detach(folder[1])
+        folder[1].deleteLater()
+        if folder[2] is not None:
+            folder[2].deleteLater()
+
+    def drop(self, entries):
+        """收藏夹被删除时释放它的模型。"""
+        folder = self._folders.pop(id(entries), None)
+        if folder is not None:
+            self._release(folder)
+
+    def clear(self):
+        folders = list(self._folders.values())
+        self._folders.clear()
+        for folder in folders:
+            self._release(folder)
+
+
+class FullWidthListView(QListView):
+    """条目始终占满视口宽度的列表视图，数据来自 EntryListModel。
+
+    所有行等高（uniformItemSizes）：排版时视图只向 ListItemDelegate 要一次尺寸——
+    高度由字体决定、宽度取视口宽度——再套用到每一行，所以显示、缩放时重新排版的
+    开销与行数无关，也不再逐条设置尺寸。本程序窗口初始 hide() 且列表位于
+    QStackedWidget 中，初次布局时视口宽度还不正确，所以显示时再排一次版。
+    为兼容原先按 QListWidget 编写的调用代码，保留 currentRow/setCurrentRow/count/
+    currentItem 这几个按行号操作的方法和 currentItemChanged 信号。
+    """
+    currentItemChanged = pyqtSignal(object, object)   # (当前行索引或 None, 之前行索引或 None)
+    rowDropped = pyqtSignal(int, int)                 # 拖放移动：(原行号, 新行号)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # 新增条目后，把新行也撑满宽度
-        self.model().rowsInserted.connect(self._on_rows_inserted)
+        self.setUniformItemSizes(True)
+        # 视口变化时重新布局（等高行只需一次尺寸查询），使条目宽度跟随
+        self.setResizeMode(QListView.ResizeMode.Adjust)
 
     def showEvent(self, event):
         super().showEvent(event)
-        self._stretch_all()
+        self.scheduleDelayedItemsLayout()
 
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        self._stretch_all()
+    def currentChanged(self, current, previous):
+        super().currentChanged(current, previous)
+        self.currentItemChanged.emit(current if current.isValid() else None,
+                                     previous if previous.isValid() else None)
 
-    def _row_height(self, item):
-        h = item.sizeHint().height()
-        return h if h > 0 else 28
+    @contextmanager
+    def populating(self):
+        """整批换数据（加载历史、载入收藏夹）期间暂停重绘，结束后只排版、重绘一次。"""
+        self.setUpdatesEnabled(False)
+        try:
+            yield
+        finally:
+            self.setUpdatesEnabled(True)
 
-    def _stretch_all(self):
-        w = self.viewport().width()
-        if w <= 0:
-            return
-        for i in range(self.count()):
-            item = self.item(i)
-            if item is not None and item.sizeHint().width() != w:
-                item.setSizeHint(QSize(w, self._row_height(item)))
-
-    def _on_rows_inserted(self, parent, first, last):
-        w = self.viewport().width()
-        if w <= 0:
+    def currentRow(self):
+        index = self.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self.model().index(row, 0))
+
+    def currentItem(self):
+        index = self.currentIndex()
+        return index if index.isValid() else None
+
+    def count(self):
+        return self.model().rowCount()
+
+    def dropEvent(self, event):
+        """拖放只在本列表内移动：经 rowDropped 交给调用方同时移动数据。
+
+        把动作改成 CopyAction，防止基类在拖放结束后再删除源行。
+        """
+        if event.source() is not self:
+            event.ignore()
             return
-        for i in range(first, last + 1):
-            item = self.item(i)
-            if item is not None:
-                item.setSizeHint(QSize(w, self._row_height(item)))
+        src = self.currentRow()
+        index = self.indexAt(event.position().toPoint())
+        if index.isValid():
+            dst = index.row()
+            if self.dropIndicatorPosition() == QListView.DropIndicatorPosition.BelowItem:
+                dst += 1
+        else:
+            dst = self.count()
+        if dst > src:
+            dst -= 1  # 源行移走后，后面的行号都前移一位
+        event.setDropAction(Qt.DropAction.CopyAction)
+        event.accept()
+        self.stopAutoScroll()
+        self.setState(QListView.State.NoState)
+        self.viewport().update()
+        if 0 <= src < self.count() and src != dst:
+            self.rowDropped.emit(src, dst)
 
 
 class ListItemDelegate(QStyledItemDelegate):
     """列表项代理：
     - show_description=True：左半边显示内容，右半边显示描述（收藏面板）
     - show_description=False：内容占满整行宽度（历史记录面板）
+
+    省略后的文本（elidedText 要对整段文字排版测量）放在一个有上限的 LRU 缓存里，
+    键为 (条目对象 id, 种类/行号, 可用宽度, 字体)，滚动、方向键移动、悬停重绘时
+    直接复用；条目被编辑时由 invalidate()（接模型的 dataChanged）丢弃。
     """
+    ROW_HEIGHT = 28  # 行高下限
+    ELIDE_CACHE_SIZE = 4096
+
     def __init__(self, app, parent=None, show_description=True):
         super().__init__(parent)
         self.app = app  # 主窗口引用，用于按行号读取描述
         self.show_description = show_description
-
-    def _get_description(self, row):
-        """按行号从当前收藏夹数据中读取描述"""
+        self._elided = OrderedDict()  # key -> (条目对象, 省略后的文本)
+
+    def _elide(self, fm, font_key, entry, kind, width, make_text):
+        """取缓存的省略文本；未命中时才调用 make_text() 生成并测量。"""
+        key = (id(entry), kind, width, font_key)
+        hit = self._elided.get(key)
+        # 同时核对对象本身，防止条目被释放后 id 被新对象复用
+        if hit is not None and hit[0] is entry:
+            self._elided.move_to_end(key)
+            return hit[1]
+        text = fm.elidedText(make_text(), Qt.TextElideMode.ElideRight, width)
+        self._elided[key] = (entry, text)
+        if len(self._elided) > self.ELIDE_CACHE_SIZE:
+            self._elided.popitem(last=False)
+        return text
+
+    def invalidate(self, top_left=None, bottom_right=None, roles=None):
+        """条目被编辑后丢弃它们的缓存（接模型的 dataChanged）；不带参数时全部清空。"""
+        if top_left is None:
+            self._elided.clear()
+            return
+        model = top_left.model()
+        ids = {id(model.data(model.index(row), EntryListModel.EntryRole))
+               for row in range(top_left.row(), bottom_right.row() + 1)}
+        for key in [k for k in self._elided if k[0] in ids]:
+            del self._elided[key]
+
+    def _get_description(self, entries, item):
+        """从收藏夹显示缓存读取条目的单行描述"""
         try:
-            items = self.app.favorites.get(self.app.current_folder, [])
-            if 0 <= row < len(items):
-                item = items[row]
-                if isinstance(item, dict):
-                    desc = item.get("description", "") or ""
-                    return desc.replace('\n', ' ').replace('\r', '')
+            return self.app.favorites_display.get(entries, item)[1]
         except Exception:
-            pass
-        return ""
+            return ""
 
     def paint(self, painter, option, index):
         painter.save()
@@ -1336,13 +1850,19 @@ class ListItemDelegate(QStyledItemDelegate):
             desc_color = QColor("#666666")
 
         fm = painter.fontMetrics()
-        content = index.data(Qt.ItemDataRole.DisplayRole) or ""
+        font_key = painter.font().key()
+        row = index.row()
+        entry = index.data(EntryListModel.EntryRole)
+
+        def content():
+            # 编号在绘制时按行号生成：增删、移动条目后无需改写任何已存的文本
+            return list_number_prefix(row) + (index.data(Qt.ItemDataRole.DisplayRole) or "")
 
         if not self.show_description:
             # 历史记录：内容占满整行宽度
             full_rect = QRect(rect.left() + padding, rect.top(),
                               rect.width() - padding * 2, rect.height())
-            elided_content = fm.elidedText(content, Qt.TextElideMode.ElideRight, full_rect.width())
+            elided_content = self._elide(fm, font_key, entry, row, full_rect.width(), content)
             painter.setPen(text_color)
             painter.drawText(full_rect,
                              int(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft),
@@ -1353,10 +1873,10 @@ class ListItemDelegate(QStyledItemDelegate):
         # 收藏面板：左半边内容，右半边描述
         mid = rect.left() + rect.width() // 2
 
-        # 左半边：内容（DisplayRole 已包含编号前缀）
+        # 左半边：编号 + 内容
         left_rect = QRect(rect.left() + padding, rect.top(),
                           mid - rect.left() - padding * 2, rect.height())
-        elided_content = fm.elidedText(content, Qt.TextElideMode.ElideRight, left_rect.width())
+        elided_content = self._elide(fm, font_key, entry, row, left_rect.width(), content)
         painter.setPen(text_color)
         painter.drawText(left_rect,
                          int(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft),
@@ -1367,10 +1887,10 @@ class ListItemDelegate(QStyledItemDelegate):
         painter.drawLine(mid, rect.top() + 4, mid, rect.bottom() - 4)
 
         # 右半边：描述
-        description = self._get_description(index.row())
         right_rect = QRect(mid + padding, rect.top(),
                            rect.right() - mid - padding * 2, rect.height())
-        elided_desc = fm.elidedText(description, Qt.TextElideMode.ElideRight, right_rect.width())
+        elided_desc = self._elide(fm, font_key, entry, 'desc', right_rect.width(),
+                                  lambda: self._get_description(index.model().entries(), entry))
         painter.setPen(desc_color)
         painter.drawText(right_rect,
                          int(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft),
@@ -1379,19 +1899,17 @@ class ListItemDelegate(QStyledItemDelegate):
         painter.restore()
 
     def sizeHint(self, option, index):
-        size = super().sizeHint(option, index)
-        if size.height() < 28:
-            size.setHeight(28)
-        # 让条目占满列表视口宽度（QListWidget 默认只用文本宽度作为条目宽度）
+        # 所有行等高（FullWidthListView 开启了 uniformItemSizes），不测量条目文本：
+        # 高度只取决于字体，宽度占满列表视口
+        height = max(self.ROW_HEIGHT, option.fontMetrics.height() + 12)
+        width = 0
         view = self.parent()
         if view is not None:
             try:
-                vw = view.viewport().width()
-                if vw > 0:
-                    size.setWidth(vw)
+                width = max(view.viewport().width(), 0)
             except Exception:
                 pass
-        return size
+        return QSize(width, height)
 
 
 class LoginDialog(QDialog):
@@ -1473,6 +1991,11 @@ class CloudAppendWorker(QThread):
 
 
 class ClipboardHistoryApp(QMainWindow):
+    # 捕获线程 -> 界面线程：(条目, 内容哈希)
+    capture_ready = pyqtSignal(object, str)
+    # 热键派发后超过这么久才绘制的，视为与这次显示无关，不记延迟
+    LATENCY_TIMEOUT_MS = 2000
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("剪贴板历史")
@@ -1505,63 +2028,75 @@ class ClipboardHistoryApp(QMainWindow):
         layout.addWidget(self.stacked_widget)
         
         # 创建历史记录列表
-        self.history_list = FullWidthListWidget()
+        self.history_list = FullWidthListView()
         self.history_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.history_list.customContextMenuRequested.connect(self.show_history_context_menu)
         self.history_list.keyPressEvent = self.list_key_press
         # 添加样式
         self.history_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 padding: 5px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 2px;
                 margin: 2px 0px;
                 border-radius: 4px;
                 background-color: #f8f9fa;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #e3f2fd;
                 color: #1976d2;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: #f5f5f5;
             }
         """)
+        # 列表模型直接以 clipboard_history 为数据，显示文本在绘制时按需生成
+        self.history_model = EntryListModel(display=self.truncate_text, parent=self)
+        self.history_list.setModel(self.history_model)
         # 使用自定义代理：内容占满整行宽度（无描述列）
-        self.history_list.setItemDelegate(ListItemDelegate(self, self.history_list, show_description=False))
-        self.history_list.setResizeMode(QListView.ResizeMode.Adjust)  # 视口变化时重新布局，使条目宽度跟随
+        history_delegate = ListItemDelegate(self, self.history_list, show_description=False)
+        self.history_model.dataChanged.connect(history_delegate.invalidate)  # 编辑后丢弃省略文本缓存
+        self.history_list.setItemDelegate(history_delegate)
         self.stacked_widget.addWidget(self.history_list)
 
         # 创建收藏列表
-        self.favorites_list = FullWidthListWidget()
+        self.favorites_list = FullWidthListView()
         self.favorites_list.keyPressEvent = self.list_key_press
-        self.favorites_list.setDragDropMode(QListWidget.DragDropMode.InternalMove)
+        # 每个收藏夹一份常驻模型（直接以该收藏夹的 list 为数据），切换收藏夹只换模型；
+        # favorites_model 始终指向当前显示的那一份；加载收藏夹前、当前收藏夹的模型被释放时
+        # 显示一个空模型
+        self.favorites_display = FolderDisplayCache(self._normalize_favorite)
+        self.favorite_models = FolderModelCache(self._create_favorites_model, self._detach_favorites_model)
+        self.empty_favorites_model = EntryListModel(parent=self)
+        self.favorites_model = self.empty_favorites_model
+        self.favorites_list.setModel(self.favorites_model)
+        self.favorites_list.setDragDropMode(QListView.DragDropMode.InternalMove)
         self.favorites_list.setDefaultDropAction(Qt.DropAction.MoveAction)
-        self.favorites_list.setSelectionMode(QListWidget.SelectionMode.SingleSelection)
+        self.favorites_list.setSelectionMode(QListView.SelectionMode.SingleSelection)
         # 添加相同的样式
         self.favorites_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 padding: 5px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 2px;
                 margin: 2px 0px;
                 border-radius: 4px;
                 background-color: #f8f9fa;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #e3f2fd;
                 color: #1976d2;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: #f5f5f5;
             }
         """)
-        self.favorites_list.model().rowsMoved.connect(self.on_favorites_reordered)  # 连接重排序信号
+        self.favorites_list.rowDropped.connect(self.on_favorites_reordered)  # 连接拖放重排序信号
         # 使用自定义代理：左半边显示内容，右半边显示描述
-        self.favorites_list.setItemDelegate(ListItemDelegate(self, self.favorites_list, show_description=True))
-        self.favorites_list.setResizeMode(QListView.ResizeMode.Adjust)  # 视口变化时重新布局，使条目宽度跟随
+        self.favorites_delegate = ListItemDelegate(self, self.favorites_list, show_description=True)
+        self.favorites_list.setItemDelegate(self.favorites_delegate)
         self.stacked_widget.addWidget(self.favorites_list)
         
         # 为收藏列表添加右键菜单
@@ -1612,6 +2147,9 @@ class ClipboardHistoryApp(QMainWindow):
         folder_layout.addWidget(self.delete_folder_btn)
         top_layout.addLayout(folder_layout)
         
+        # 后台合并写入：历史与收藏夹的保存请求在安静期后合并为一次写入
+        self.persister = WriteBehindPersister(quiet_ms=300, max_latency_ms=2000)
+        
         # 初始化云端收藏夹同步（经 Cloudflare Worker；配置从同目录 .env 或系统环境变量读取）
         load_env_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
         self.d1 = D1Storage.from_env()
@@ -1621,32 +2159,63 @@ class ClipboardHistoryApp(QMainWindow):
         else:
             print("未配置 Worker，收藏夹仅保存在本地文件")
 
+        # 大内容外置存储（历史与收藏共用）
+        self.blob_store = BlobStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.clipboard_blobs'))
+
+        # 子串搜索的 n-gram 倒排索引：不写入磁盘，加载历史后在后台线程重建，
+        # 建好之前搜索逐条核对（见 _build_search_index）。加载收藏夹时就会用到，须先创建
+        self.search_index = NgramIndex()
+        self._favorite_keys_cache = {}   # id(收藏条目) -> (条目, 内容对象, 描述, 内容 key, 描述 key)
+        # 各段内容的规整形式（lower()、词集合），按内容哈希缓存，编辑后自然换新
+        self.search_forms = NormalizedCache()
+        
         # 加载收藏记录
         self.load_favorites()
         
-        # 存储剪贴板历史
-        self.clipboard_history = []
+        # 加载配置（历史记录上限等设置需要在加载历史前读取）
+        self.config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.clipboard_config.json')
+        self.load_config()
+
+        self.history_max_items = int(self.config.get('history_max_items', HISTORY_MAX_ITEMS))
+        
+        # 存储剪贴板历史（按内容哈希索引，判重与移到最前均为 O(1)）
+        self.clipboard_history = HistoryIndex(max_items=self.history_max_items)
         
         # 获取系统剪贴板
         self.clipboard = QApplication.clipboard()
-        self.clipboard.dataChanged.connect(self.on_clipboard_change)
+        
+        # 剪贴板变化检测后端：定时器只比较序号，序号前进时才读取文本
+        self.clipboard_watcher = create_backend(self.clipboard)
+        
+        # 捕获线程：读取（Windows 下）、规整、算哈希、外置大内容都在后台完成，
+        # 界面线程只收到 capture_ready 信号并做 O(1) 的增量更新
+        self.capture_ready.connect(self.move_to_history_top)
+        # 超过外置阈值的内容按大小延迟读取：只取预览，全文流式写入外置存储
+        self.capture_worker = CaptureWorker(self.clipboard_watcher, self._prepare_capture,
+                                            self.capture_ready.emit,
+                                            lazy_threshold=self.blob_store.threshold)
+        
+        # 单一捕获管线：dataChanged 与定时器都只向它报告，每次复制只处理一次
+        # （须在 create_backend 之后连接，保证 Qt 后端先自增序号）
+        self.capture = CapturePipeline(self.clipboard_watcher, self.on_clipboard_change,
+                                       window_ms=80, schedule=QTimer.singleShot, defer_read=True)
+        self.clipboard.dataChanged.connect(self.capture.notify)
         
         # 设置定时器检查剪贴板变化
         self.timer = QTimer()
         self.timer.timeout.connect(self.check_clipboard)
         self.timer.start(500)  # 每500毫秒检查一次
         
-        self.last_text = self.clipboard.text()
-        
-        # 设置保存文件的路径
+        # 设置保存文件的路径（默认快照 + 追加日志；history_engine 设为 sqlite 则用 SQLite + 全文索引）
         self.history_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.clipboard_history.json')
+        self.history_store = open_history_store(self.config.get('history_engine', 'journal'), self.history_file)
+        # 历史改动先排队，由后台线程在安静期后合并写入
+        self.history_store.on_dirty = lambda: self.persister.schedule('history', self.history_store.flush)
         
         # 加载历史记录
         self.load_history()
-        
-        # 加载配置
-        self.config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.clipboard_config.json')
-        self.load_config()
+        self._collect_blobs()
+        self._build_search_index()
         
         # 创建系统托盘图标 (只调用一次)
         self.create_tray_icon()
@@ -1655,13 +2224,29 @@ class ClipboardHistoryApp(QMainWindow):
         self.hotkey_manager = GlobalHotkeyManager()
         QApplication.instance().installNativeEventFilter(self.hotkey_manager)
         QApplication.instance().aboutToQuit.connect(self.hotkey_manager.unregister_all)
+        QApplication.instance().aboutToQuit.connect(self._on_about_to_quit)
         self.register_hotkeys()
         
-        # 设置窗口标志，移除关闭按钮
-        self.setWindowFlags(
-            Qt.WindowType.Window |
-            Qt.WindowType.FramelessWindowHint
-        )
+        # 设置窗口标志，移除关闭按钮。预热模式（默认）下一开始就带上置顶标志，
+        # show_window 不再调用 setWindowFlags（那会销毁并重建原生窗口），只移动、显示
+        self.instant_show = bool(self.config.get('instant_show', True))
+        if self.instant_show:
+            self.setWindowFlags(
+                Qt.WindowType.Window |
+                Qt.WindowType.FramelessWindowHint |
+                Qt.WindowType.WindowStaysOnTopHint
+            )
+        else:
+            self.setWindowFlags(
+                Qt.WindowType.Window |
+                Qt.WindowType.FramelessWindowHint
+            )
+        self._show_geometry = None   # (屏幕区域, 窗口尺寸, 位置)：两者不变时沿用上次算好的位置
+
+        # 热键按下到窗口第一次画出的耗时，追加记录到日志便于长期对比
+        self.show_latency = LatencyRecorder(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), '.hotkey_latency.log'))
+        self._latency_start = None   # 热键派发时刻，等待下一次绘制；隐藏窗口或超时后作废
         
         # 安装事件过滤器来处理窗口事件
         self.installEventFilter(self)
@@ -1670,8 +2255,8 @@ class ClipboardHistoryApp(QMainWindow):
         self.history_list.keyPressEvent = self.list_key_press
         
         # 双击列表项也触发粘贴
-        self.history_list.itemDoubleClicked.connect(self.paste_selected)
-        self.favorites_list.itemDoubleClicked.connect(self.paste_selected)
+        self.history_list.doubleClicked.connect(self.paste_selected)
+        self.favorites_list.doubleClicked.connect(self.paste_selected)
         
         
         # 创建预览窗口
@@ -1710,7 +2295,7 @@ class ClipboardHistoryApp(QMainWindow):
     def show_preview(self, current, previous):
         """显示选中条目的完整内容"""
         if not current:
-            self.preview_window.hide()
+            self.preview_window.cancel()
             return
         
         # 只有当主窗口可见时才显示预览窗口
@@ -1722,43 +2307,22 @@ class ClipboardHistoryApp(QMainWindow):
         
         try:
             if self.stacked_widget.currentIndex() == 0:
-                # 历史记录面板
+                # 历史记录面板：条目本身（str 或 BlobRef）
                 data_list = self.clipboard_history
-                original_text = data_list[current_row]
-                description = ""
+                content_of = lambda entry: entry
             else:
-                # 收藏夹面板
+                # 收藏夹面板：处理新旧格式数据
                 data_list = self.favorites[self.current_folder]
-                item = data_list[current_row]
-                # 处理新旧格式数据
-                if isinstance(item, str):
-                    original_text = item
-                    description = ""
-                else:
-                    original_text = item["text"]
-                    description = item.get("description", "")
+                content_of = lambda item: item.get("text", "") if isinstance(item, dict) else str(item)
             
             if 0 <= current_row < len(data_list):
-                # 移除条件判断，总是显示预览窗口
-                self.preview_window.set_content(original_text, description)
-                
-                # 计算预览窗口的位置
-                screen = QApplication.primaryScreen().geometry()
-                preview_width = self.preview_window.width()
-                
-                # 计算预览窗口的理想x坐标
-                ideal_x = self.x() + self.width() + 10
-                
-                # 如果预览窗口会超出屏幕右边界，则将其放在主窗口左侧
-                if ideal_x + preview_width > screen.right():
-                    preview_x = self.x() - preview_width - 10
-                else:
-                    preview_x = ideal_x
-                
-                preview_y = self.y()
-                
-                self.preview_window.move(preview_x, preview_y)
-                self.preview_window.show()
+                item = data_list[current_row]
+                description = item.get("description", "") if isinstance(item, dict) else ""
+                # 外置的大内容防抖后才读回，并预取上下相邻的两行
+                neighbours = [content_of(data_list[r]) for r in (current_row + 1, current_row - 1)
+                              if 0 <= r < len(data_list)]
+                self.preview_window.request(content_of(item), self._display_text, description,
+                                            self, neighbours)
         except Exception as e:
             print(f"预览显示错误: {e}")
             self.preview_window.hide()
@@ -1766,38 +2330,61 @@ class ClipboardHistoryApp(QMainWindow):
 
 
     def check_clipboard(self):
-        current_text = self.clipboard.text()
-        if current_text != self.last_text:
-            self.on_clipboard_change()
-            self.last_text = current_text
-
-    def on_clipboard_change(self):
-        text = self.clipboard.text()
-        if text:
-            print(f"原始文本: {text}")  # 调试输出
-            # 检查是否已存在于历史记录中
-            if text in self.clipboard_history:
-                # 如果已存在，从原位置移除
-                index = self.clipboard_history.index(text)
-                self.clipboard_history.pop(index)
-                self.history_list.takeItem(index)
-            
-            # 添加新条目到历史记录开头
-            self.clipboard_history.insert(0, text)
-            # 显示截断后的文本
-            truncated_text = self.truncate_text(text)
-            print(f"截断后文本: {truncated_text}")  # 调试输出
-            self.history_list.insertItem(0, truncated_text)
-            
-            # 如果历史记录超过30个，删除多余的条目
-            while len(self.clipboard_history) > 30:
-                self.clipboard_history.pop()
-                self.history_list.takeItem(self.history_list.count() - 1)
-            
-            # 更新编号
-            self.update_list_numbers(self.history_list)
-            # 保存历史记录
-            self.save_history()
+        """定时检查剪贴板：交给捕获管线，序号未变时不读取剪贴板内容"""
+        self.capture.poll()
+
+    def on_clipboard_change(self, text=None, seq=None):
+        """捕获管线的回调：每个剪贴板序号只调用一次，交给捕获线程处理。
+
+        text 为 None 表示由捕获线程自己读取（Windows）；否则是界面线程已读到的文本。
+        """
+        self.capture_worker.submit(text, seq)
+
+    def _prepare_capture(self, text, seq):
+        """捕获线程中执行：与内容大小相关的工作全部在这里完成。"""
+        if isinstance(text, LargeClipboardText):
+            # 超大内容：只解码开头做预览，全文分块流式写入外置存储
+            print(f"原始文本（大内容）: {text.prefix(200)}")  # 调试输出
+            entry = self.blob_store.externalize_stream(text.chunks())
+            if entry is not None:
+                return entry, entry.key
+            text = text.text()
+        if not text:
+            return None
+        print(f"原始文本: {text[:200]}")  # 调试输出（只打印开头，免得大内容刷屏）
+        # 内容哈希只算一次，界面线程判重、写日志都直接用它
+        key = content_key(text)
+        # 超过阈值的大内容放入外置存储，历史里只留哈希与预览
+        entry = self.blob_store.externalize(text, key)
+        return entry, key
+
+    def move_to_history_top(self, entry, key=None):
+        """把条目放到历史最前（O(1) 增量更新），并只排队一条历史记录。
+
+        捕获线程准备好的条目经 capture_ready 信号到这里；粘贴时也直接调用。
+        """
+        history = self.clipboard_history
+        key = key or entry_key(entry)
+        # 按内容哈希判重：已存在则整行移到最前，否则在最前插入一行
+        old_row = history.row_of_key(key)
+        if old_row == 0:
+            return  # 本来就在最前，无需任何改动
+        if old_row is not None:
+            with self.history_model.moving(old_row, 0):
+                history.touch(entry, key)
+        else:
+            with self.history_model.inserting(0):
+                history.touch(entry, key)
+        
+        # 如果历史记录超过上限，从末尾删除多余的条目
+        if history.max_items and len(history) > history.max_items:
+            with self.history_model.removing(history.max_items, len(history) - 1):
+                evicted = history.trim()
+            self._forget_keys(evicted)
+        
+        # 只向历史日志排队一条记录，由后台线程写入
+        self.history_store.record_touch(entry, old_row is not None, key)
+        self._index_entry(entry, key)
 
     def copy_selected(self):
         """复制选中项"""
@@ -1805,37 +2392,57 @@ class ClipboardHistoryApp(QMainWindow):
         current_item = current_list.currentItem()
         if current_item:
             # 使用原始文本而不是截断的文本
-            original_text = (self.clipboard_history if self.stacked_widget.currentIndex() == 0 
-                            else self.favorites[self.current_folder])[current_list.currentRow()]
-            self.clipboard.setText(original_text)
+            if self.stacked_widget.currentIndex() == 0:
+                entry = self.clipboard_history[current_list.currentRow()]
+            else:
+                item = self.favorites[self.current_folder][current_list.currentRow()]
+                entry = item["text"] if isinstance(item, dict) else str(item)
+            try:
+                original_text = self._entry_text(entry)
+            except BlobMissingError as e:
+                self._warn_missing_blob(e)
+                return
+            self.copy_to_clipboard(entry, original_text)
 
     def clear_history(self):
-        self.clipboard_history.clear()
-        self.history_list.clear()
+        keys = [key for key, _ in self.clipboard_history.items()]
+        with self.history_model.resetting():
+            self.clipboard_history.clear()
+        self._forget_keys(keys)
         # 清空后保存状态
-        self.save_history()
+        self.history_store.record_clear()
 
     def load_history(self):
-        """从文件加载历史记录"""
+        """从历史存储加载最近的历史记录（JSON 快照 + 日志，或 SQLite）"""
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    self.clipboard_history = json.load(f)
-                    self.history_list.clear()
-                    for text in self.clipboard_history:
-                        truncated_text = self.truncate_text(text)
-                        self.history_list.addItem(truncated_text)
-                    # 更新编号
-                    self.update_list_numbers(self.history_list)
+            self.clipboard_history = self.history_store.load(self.history_max_items)
         except Exception as e:
             print(f"加载历史记录时出错: {e}")
-            self.clipboard_history = []
+            self.clipboard_history = HistoryIndex(max_items=self.history_max_items)
+            self.history_store.history = self.clipboard_history
+        # 模型直接指向新数据：一次重置，不逐条添加，期间视图不重绘
+        with self.history_list.populating():
+            self.history_model.set_entries(self.clipboard_history)
+
+    def _on_about_to_quit(self):
+        """退出前写出所有排队的改动，并等待云端同步完成（最多几秒）。"""
+        try:
+            self.persister.flush()
+            self.history_store.close()
+            if self.d1.enabled and not self.d1.wait_idle(timeout=5):
+                print("云端同步未在退出前完成")
+            p = self.persister
+            print(f"后台保存：请求 {p.requests} 次，实际写入 {p.writes} 次，合并 {p.coalesced} 次，失败 {p.failures} 次")
+            stats = self.show_latency.summary()
+            if stats:
+                print("热键到窗口显示：共 {} 次，中位数 {:.1f} ms，p95 {:.1f} ms，最大 {:.1f} ms".format(*stats))
+        except Exception as e:
+            print(f"退出前保存数据时出错: {e}")
 
     def save_history(self):
-        """保存历史记录到文件"""
+        """整理历史存储：JSON 引擎写新快照，SQLite 引擎整理索引（日常改动已逐条写入，无需调用）"""
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.clipboard_history, f, ensure_ascii=False, indent=2)
+            self.history_store.compact()
         except Exception as e:
             print(f"保存历史记录时出错: {e}")
 
@@ -1939,7 +2546,7 @@ class ClipboardHistoryApp(QMainWindow):
             self.stacked_widget.setCurrentIndex(1)
             self.panel_label.setText("收藏夹")
             self.favorites_list.setFocus()
-            # 确保显示当前收藏夹的内容
+            # 确保显示当前收藏夹的内容（模型已是当前收藏夹的时直接返回）
             self.change_folder(self.current_folder)
         elif event.key() == Qt.Key.Key_Left and self.stacked_widget.currentIndex() == 1:
             self.stacked_widget.setCurrentIndex(0)
@@ -1960,25 +2567,20 @@ class ClipboardHistoryApp(QMainWindow):
             current_row = current_list.currentRow()
             if current_row >= 0:
                 if self.stacked_widget.currentIndex() == 0:
-                    # 从历史记录获取完整文本
-                    original_text = self.clipboard_history[current_row]
-                    # 从原位置移除
-                    self.clipboard_history.pop(current_row)
-                    self.history_list.takeItem(current_row)
-                    # 插入到顶部
-                    self.clipboard_history.insert(0, original_text)
-                    truncated_text = self.truncate_text(original_text)
-                    self.history_list.insertItem(0, truncated_text)
-                    # 更新编号
-                    self.update_list_numbers(self.history_list)
-                    # 保存历史记录
-                    self.save_history()
+                    # 从历史记录获取
+                    entry = self.clipboard_history[current_row]
                 else:
-                    # 从收藏夹获取完整文本
+                    # 从收藏夹获取
                     item = self.favorites[self.current_folder][current_row]
-                    original_text = item["text"] if isinstance(item, dict) else str(item)
-                # 复制到剪贴板
-                self.clipboard.setText(original_text)
+                    entry = item["text"] if isinstance(item, dict) else str(item)
+                try:
+                    # 完整文本（读不回时不移动、不复制）
+                    original_text = self._entry_text(entry)
+                except BlobMissingError as e:
+                    self._warn_missing_blob(e)
+                    return
+                # 移到历史顶部并复制到剪贴板
+                self.copy_to_clipboard(entry, original_text)
                 # 复制成功后隐藏窗口，回退到系统托盘
                 self.hide()
         # 修改为 Alt+C 快捷键
@@ -2019,7 +2621,7 @@ class ClipboardHistoryApp(QMainWindow):
             pass
         else:
             # 保持其他按键的默认行为
-            QListWidget.keyPressEvent(self.history_list if self.stacked_widget.currentIndex() == 0 else self.favorites_list, event)
+            QListView.keyPressEvent(self.history_list if self.stacked_widget.currentIndex() == 0 else self.favorites_list, event)
 
     def move_favorite_item(self, direction):
         """移动收藏条目"""
@@ -2029,18 +2631,10 @@ class ClipboardHistoryApp(QMainWindow):
         
         new_row = current_row + direction
         if 0 <= new_row < self.favorites_list.count():
-            # 从列表控件中移动项目
-            item = self.favorites_list.takeItem(current_row)
-            self.favorites_list.insertItem(new_row, item)
+            # 移动收藏夹数据中的项目，列表同步移动这一行
+            self.move_entry(self.favorites[self.current_folder], current_row, new_row)
             self.favorites_list.setCurrentRow(new_row)
             
-            # 从收藏夹数据中移动项目
-            current_folder_items = self.favorites[self.current_folder]
-            item_text = current_folder_items.pop(current_row)
-            current_folder_items.insert(new_row, item_text)
-            
-            # 更新编号
-            self.update_list_numbers(self.favorites_list)
             # 保存更改
             self.save_favorites()
 
@@ -2056,12 +2650,8 @@ class ClipboardHistoryApp(QMainWindow):
             }
             self.delete_history.append(deleted_item)
             
-            # 从数据中删除
-            self.favorites[self.current_folder].pop(current_row)
-            # 从列表控件中删除
-            self.favorites_list.takeItem(current_row)
-            # 更新编号
-            self.update_list_numbers(self.favorites_list)
+            # 从数据中删除（列表同步删除该行）
+            self.pop_entry(self.favorites[self.current_folder], current_row)
             # 保存更改
             self.save_favorites()
             
@@ -2075,7 +2665,9 @@ class ClipboardHistoryApp(QMainWindow):
                 )
                 if reply == QMessageBox.StandardButton.Yes:
                     # 删除空收藏夹
-                    del self.favorites[self.current_folder]
+                    entries = self.favorites.pop(self.current_folder)
+                    self.favorites_display.drop(entries)
+                    self.favorite_models.drop(entries)
                     # 更新下拉菜单
                     self.folder_combo.removeItem(self.folder_combo.findText(self.current_folder))
                     # 切换到默认收藏夹
@@ -2104,13 +2696,9 @@ class ClipboardHistoryApp(QMainWindow):
                 self.folder_combo.setCurrentText(folder)
                 self.change_folder(folder)
             
-            # 恢复删除的项目
-            self.favorites[folder].insert(position, item)
-            truncated_text = self.truncate_text(item['text'])
-            self.favorites_list.insertItem(position, truncated_text)
+            # 恢复删除的项目（列表同步插入该行）
+            self.insert_entry(self.favorites[folder], position, item)
             
-            # 更新编号
-            self.update_list_numbers(self.favorites_list)
             # 保存更改
             self.save_favorites()
             
@@ -2125,34 +2713,37 @@ class ClipboardHistoryApp(QMainWindow):
             # 使用原始文本而不是截断的文本
             current_row = current_list.currentRow()
             if self.stacked_widget.currentIndex() == 0:
-                # 从历史记录中获取
+                # 从历史记录中获取（外置的大内容此时仍是 BlobRef）
                 original_text = self.clipboard_history[current_row]
             else:
                 # 从收藏夹中获取
                 item = self.favorites[self.current_folder][current_row]
                 original_text = item["text"] if isinstance(item, dict) else str(item)
             
-            # 无论是从历史记录还是收藏夹，都将内容更新到历史记录顶部
-            if original_text in self.clipboard_history:
-                # 如果已存在，先移除旧的
-                old_index = self.clipboard_history.index(original_text)
-                self.clipboard_history.pop(old_index)
-                self.history_list.takeItem(old_index)
-            
-            # 插入到顶部
-            self.clipboard_history.insert(0, original_text)
-            truncated_text = self.truncate_text(original_text)
-            self.history_list.insertItem(0, truncated_text)
+            # 外置的大内容读不回时拒绝粘贴，不把预览当作全文
+            try:
+                full_text = self._entry_text(original_text)
+            except BlobMissingError as e:
+                self._warn_missing_blob(e)
+                return
             
-            # 更新编号
-            self.update_list_numbers(self.history_list)
-            # 保存历史记录
-            self.save_history()
+            # 无论是从历史记录还是收藏夹，都将内容更新到历史记录顶部（唯一一次保存）
+            self.move_to_history_top(original_text)
             
-            self.clipboard.setText(original_text)
+            # 自身写入：捕获管线不会再对这次变化读取、判重、保存
+            self.set_clipboard_text(full_text)
             self.hide()
             QTimer.singleShot(100, lambda: keyboard.send('ctrl+v'))
 
+    def copy_to_clipboard(self, entry, text):
+        """复制条目：放到历史最前（唯一一次保存），再作为自身写入写剪贴板，不再触发一轮捕获"""
+        self.move_to_history_top(entry)
+        self.set_clipboard_text(text)
+
+    def set_clipboard_text(self, text):
+        """本程序自己写剪贴板（粘贴、恢复原剪贴板）：标记为自身写入，不进入捕获流程"""
+        self.capture.own_write(lambda: self.clipboard.setText(text))
+
     def toggle_window(self):
         """切换窗口显示/隐藏状态"""
         if self.isVisible() and self.isActiveWindow():
@@ -2162,13 +2753,58 @@ class ClipboardHistoryApp(QMainWindow):
             print("窗口当前隐藏或不活跃，将显示")
             self.show_window()
 
+    def prewarm_window(self):
+        """预热：不在屏幕上显示地 show/hide 一次，提前创建原生窗口、完成首次布局"""
+        if not self.instant_show or self.isVisible():
+            return
+        self.setAttribute(Qt.WidgetAttribute.WA_DontShowOnScreen, True)
+        self.show()
+        self.hide()
+        self.setAttribute(Qt.WidgetAttribute.WA_DontShowOnScreen, False)
+
+    def _window_position(self):
+        """主窗口居中且为右侧预览窗口留出空间；屏幕和窗口尺寸不变时直接复用"""
+        screen = QApplication.primaryScreen().geometry()
+        size = self.size()
+        if self._show_geometry is not None and self._show_geometry[:2] == (screen, size):
+            return self._show_geometry[2]
+        
+        # 计算所需的总宽度（主窗口 + 间距 + 预览窗口）
+        preview_window_width = 400  # 预览窗口的最大宽度
+        spacing = 10  # 窗口之间的间距
+        total_width = size.width() + spacing + preview_window_width
+        x = max(0, screen.center().x() - total_width // 2)
+        y = screen.center().y() - size.height() // 2
+        self._show_geometry = (screen, size, QPoint(x, y))
+        return self._show_geometry[2]
+
     def show_window(self):
         """显示窗口"""
         print("正在显示窗口")  # 调试信息
+        # 由全局热键触发且窗口原本隐藏时，记下派发时刻，在窗口下一次绘制时计算延迟
+        # （窗口已经可见时不一定重绘，不计）
+        dispatch = self.hotkey_manager.current_dispatch
+        if dispatch is not None and not self.isVisible():
+            self._latency_start = dispatch
         
         # 切换到收藏面板
         self.stacked_widget.setCurrentIndex(1)
         self.panel_label.setText("收藏夹")
+
+        if self.instant_show:
+            # 预热模式：窗口标志在创建时已设好，只移动并显示
+            pos = self._window_position()
+            if self.pos() != pos:
+                self.move(pos)
+            self.show()
+            self.raise_()
+            self.activateWindow()
+            if sys.platform == "win32":
+                # 热键在后台触发，需要系统把前台让给本窗口
+                ctypes.windll.user32.SetForegroundWindow(int(self.winId()))
+            self._window_show_time = time.time()
+            self.favorites_list.setFocus()
+            return
         
         # 获取屏幕尺寸
         screen = QApplication.primaryScreen().geometry()
@@ -2257,6 +2893,16 @@ class ClipboardHistoryApp(QMainWindow):
             # 处理 Alt+F4
             self.hide()
             return True
+        elif event.type() == event.Type.Paint and self._latency_start is not None:
+            # 热键触发后的第一次绘制：记录延迟
+            name, started = self._latency_start
+            self._latency_start = None
+            ms = (time.perf_counter() - started) * 1000
+            # 超时的起点多半与这次绘制无关（显示后没有重绘），丢弃
+            if ms <= self.LATENCY_TIMEOUT_MS:
+                mode = 'instant' if self.instant_show else 'classic'
+                self.show_latency.record(f"{name}/{mode}", ms)
+                print(f"热键到窗口显示耗时: {ms:.1f} ms")
         return super().eventFilter(obj, event)
 
     def keyPressEvent(self, event: QKeyEvent):
@@ -2302,28 +2948,40 @@ class ClipboardHistoryApp(QMainWindow):
     def _apply_loaded_favorites(self, favorites):
         """把加载到的收藏夹数据应用到界面。"""
         self.favorites = favorites or {}
+        self.favorites_display.clear()
+        self.favorite_models.clear()
+        old_keys = [hit[3:] for hit in self._favorite_keys_cache.values()]
+        self._favorite_keys_cache.clear()
+        self._forget_keys([key for keys in old_keys for key in keys])
 
         # 「记忆」夹走出箱模式：本地只作「待发队列」，启动时清空，不载入云端已累积的记忆
         # （那些交给安卓 app 处理）。这样本地也绝不会把旧记忆重新整包上传到云端。
         self.favorites["记忆"] = []
 
+        # 大内容放入外置存储，内存里只留哈希与预览
+        for items in self.favorites.values():
+            for item in items:
+                if isinstance(item, dict) and isinstance(item.get("text"), str):
+                    item["text"] = self.blob_store.externalize(item["text"])
+
         # 确保至少有默认收藏夹
         if "默认收藏夹" not in self.favorites:
             self.favorites["默认收藏夹"] = []
 
-        # 更新收藏夹下拉菜单
-        self.folder_combo.clear()
-        self.folder_combo.addItems(self.favorites.keys())
+        # 整批刷新：下拉菜单重填期间屏蔽其信号（否则 clear/addItems/setCurrentText
+        # 会逐个触发 change_folder），列表暂停重绘，最后只切换一次收藏夹
+        with self.favorites_list.populating():
+            self.folder_combo.blockSignals(True)
+            try:
+                self.folder_combo.clear()
+                self.folder_combo.addItems(self.favorites.keys())
+                self.folder_combo.setCurrentText("默认收藏夹")
+            finally:
+                self.folder_combo.blockSignals(False)
 
-        # 显示默认收藏夹内容
-        self.current_folder = "默认收藏夹"
-        self.folder_combo.setCurrentText("默认收藏夹")
-        self.favorites_list.clear()
-        for item in self.favorites[self.current_folder]:
-            text = item["text"] if isinstance(item, dict) else item
-            truncated_text = self.truncate_text(text)
-            self.favorites_list.addItem(truncated_text)
-        self.update_list_numbers(self.favorites_list)
+            # 显示默认收藏夹内容（换上该收藏夹的模型）
+            self.current_folder = "默认收藏夹"
+            self.change_folder(self.current_folder)
 
     def load_favorites(self):
         """只从云端加载收藏记录（不使用本地文件）。
@@ -2378,39 +3036,249 @@ class ClipboardHistoryApp(QMainWindow):
             if not getattr(self, '_cloud_ready', False):
                 print("云端数据未就绪，跳过保存以保护云端数据")
                 return
-            # 排除「记忆」夹后再整包保存
-            snapshot = {k: v for k, v in self.favorites.items() if k != "记忆"}
-            self.d1.save_async(snapshot)
+            # 连续的改动（如 Alt+↑/↓ 连续调整顺序）合并为一次保存，在后台线程执行
+            self.persister.schedule('favorites', self._write_favorites)
         except Exception as e:
             print(f"保存收藏记录时出错: {e}")
             traceback.print_exc()
 
-    def truncate_text(self, text, max_length=50):
-        """规整列表显示文本：仅去除换行符，不再按固定字符数截断。
+    def _write_favorites(self):
+        """后台合并写入线程调用：生成收藏夹快照并交给 D1 上传。"""
+        # 排除「记忆」夹后再整包保存；外置的大内容读回全文后再上传。
+        # 读不回时 _item_text 抛出 BlobMissingError，本次不上传（由合并写入线程打印原因），
+        # 绝不把截断的预览当作全文覆盖云端。
+        # list()/dict() 复制在持有 GIL 时一次完成，界面线程同时修改也不会打断迭代。
+        snapshot = {k: [dict(it, text=self._item_text(it))
+                        if isinstance(it, dict) and isinstance(it.get("text"), BlobRef) else it
+                        for it in list(v)]
+                    for k, v in list(self.favorites.items()) if k != "记忆"}
+        self.d1.save_async(snapshot)
+
+    def truncate_text(self, text, max_length=LIST_PREVIEW_CHARS):
+        """规整列表显示文本：只取开头 max_length 个字符的单行预览（见 single_line_preview）。
 
         历史/收藏两个列表都使用 ListItemDelegate，由其 elidedText 按视口
-        宽度自动省略（溢出时加“…”），因此这里返回整行文本，条目即可占满
-        宽度并尽量多显示内容。max_length 参数仅为兼容旧调用，已不再使用。
+        宽度自动省略（溢出时加“…”），预览只需比最宽的一行略长即可，
+        列表模型和显示缓存里因此不会再有第二份完整文本；完整内容只在
+        粘贴、预览时从 clipboard_history / favorites（及外置存储）读取。
+        外置的大内容（BlobRef）只显示其预览。
         """
-        return text.replace('\n', ' ').replace('\r', '')
+        if isinstance(text, BlobRef):
+            return single_line_preview(text.preview, max_length) + '…'
+        return single_line_preview(text, max_length)
+
+    def _create_favorites_model(self, entries):
+        """为一个收藏夹创建常驻模型，显示文本取自收藏夹显示缓存"""
+        model = EntryListModel(entries,
+                               display=lambda item: self.favorites_display.get(entries, item)[0],
+                               movable=True, parent=self)
+        model.dataChanged.connect(self.favorites_delegate.invalidate)  # 编辑后丢弃省略文本缓存
+        return model
+
+    def _normalize_favorite(self, item):
+        """收藏条目（dict 或旧格式 str） -> (单行内容, 单行描述)，供 FolderDisplayCache 使用"""
+        if not isinstance(item, dict):
+            return self.truncate_text(str(item)), ""
+        desc = item.get("description", "") or ""
+        return self.truncate_text(item["text"]), single_line_preview(desc)
+
+    # ---------- 列表数据的增量修改：正在显示该数据的模型同步发出行通知 ----------
+    def _model_for(self, entries):
+        if self.history_model.entries() is entries:
+            return self.history_model
+        # 未显示的收藏夹也照常通知自己的常驻模型，切换回来时无需重建
+        return self.favorite_models.find(entries)
+
+    def insert_entry(self, entries, row, entry):
+        """在 entries（历史或某个收藏夹）的 row 处插入条目"""
+        if isinstance(entries, HistoryIndex):
+            self._index_entry(entry)
+        else:
+            self.favorites_display.update(entries, entry)
+            self._favorite_keys(entry)
+        model = self._model_for(entries)
+        if model is None:
+            entries.insert(row, entry)
+            return
+        with model.inserting(row):
+            entries.insert(row, entry)
+
+    def pop_entry(self, entries, row):
+        """删除并返回 entries 第 row 行的条目"""
+        model = self._model_for(entries)
+        if model is None:
+            entry = entries.pop(row)
+        else:
+            with model.removing(row):
+                entry = entries.pop(row)
+        if isinstance(entries, HistoryIndex):
+            self._forget_keys((entry_key(entry),))
+        else:
+            self.favorites_display.discard(entries, entry)
+            self._forget_keys(self._drop_favorite_keys(entry))
+        return entry
+
+    def move_entry(self, entries, src, dst):
+        """把 entries 第 src 行移到第 dst 行"""
+        model = self._model_for(entries)
+        if model is None:
+            entries.insert(dst, entries.pop(src))
+            return
+        with model.moving(src, dst):
+            entries.insert(dst, entries.pop(src))
+
+    def replace_entry(self, entries, row, entry):
+        """替换 entries 第 row 行的条目（历史中与别的条目内容相同时会合并，行数随之变化）"""
+        old = entries[row]
+        if isinstance(entries, HistoryIndex):
+            self._index_entry(entry)
+            old_keys = (entry_key(old),)
+        else:
+            self.favorites_display.discard(entries, old)
+            self.favorites_display.update(entries, entry)
+            old_keys = self._drop_favorite_keys(old)
+            self._favorite_keys(entry)
+        model = self._model_for(entries)
+        if model is None:
+            entries[row] = entry
+        elif isinstance(entries, HistoryIndex) and entry in entries and entries.index(entry) != row:
+            # 改成了与另一条历史相同的内容：两条合并、行数变化，整体重置
+            with model.resetting():
+                entries[row] = entry
+        else:
+            entries[row] = entry
+            model.refresh(row)
+        self._forget_keys(old_keys)
+
+    def _entry_text(self, entry):
+        """历史条目的完整文本：外置的大内容（BlobRef）在这里才从磁盘读回。
+
+        内容文件缺失或损坏时抛出 BlobMissingError（绝不拿预览顶替全文）。
+        """
+        return self.blob_store.resolve(entry)
+
+    def _item_text(self, item):
+        """收藏条目（dict 或旧格式 str）的完整文本，读不回时同样抛出 BlobMissingError"""
+        text = item["text"] if isinstance(item, dict) else str(item)
+        return self.blob_store.resolve(text)
+
+    def _display_text(self, entry):
+        """只用于预览显示的文本：外置内容读不回时用其预览"""
+        return self.blob_store.resolve_or_preview(entry)
+
+    def _search_text(self, entry):
+        """搜索用的完整文本；外置内容读不回时返回 None（跳过该条，
+        以免搜索结果里的预览被当作全文粘贴、编辑）"""
+        try:
+            return self.blob_store.resolve(entry)
+        except BlobMissingError as e:
+            print(f"搜索时跳过: {e}")
+            return None
+
+    def _warn_missing_blob(self, error):
+        """粘贴、复制、编辑拿不到完整内容时告知用户，而不是悄悄用预览代替"""
+        QMessageBox.warning(self, "内容缺失", f"{error}，无法取得完整内容。")
+
+    def _collect_blobs(self):
+        """清理已不被历史记录和收藏夹引用的外置内容"""
+        try:
+            live = set(self.history_store.blob_keys())
+            for items in self.favorites.values():
+                for item in items:
+                    text = item.get("text") if isinstance(item, dict) else None
+                    if isinstance(text, BlobRef):
+                        live.add(text.key)
+            removed = self.blob_store.collect(live)
+            if removed:
+                print(f"已清理 {removed} 个不再使用的大内容文件")
+        except Exception as e:
+            print(f"清理大内容存储时出错: {e}")
+
+    # ---------- 搜索索引 ----------
+    def _index_entry(self, entry, key=None):
+        """把一段内容加入搜索索引，返回其 key；外置的大内容不拆分，总是作为候选"""
+        key = key or entry_key(entry)
+        if key not in self.search_index:
+            if isinstance(entry, BlobRef):
+                self.search_index.add_unindexed(key)
+            else:
+                self.search_index.add(key, entry)
+        return key
+
+    def _favorite_keys(self, item):
+        """收藏条目 -> (内容 key, 描述 key)，并确保两者都已进入搜索索引。
+
+        按条目对象缓存，内容或描述被替换（编辑）后才重新计算哈希。
+        """
+        if isinstance(item, dict):
+            text, description = item.get("text", ""), item.get("description", "") or ""
+        else:
+            text, description = str(item), ""
+        hit = self._favorite_keys_cache.get(id(item))
+        if hit is None or hit[0] is not item or hit[1] is not text or hit[2] is not description:
+            hit = (item, text, description, self._index_entry(text), self._index_entry(description))
+            self._favorite_keys_cache[id(item)] = hit
+        else:
+            self._index_entry(text, hit[3])
+            self._index_entry(description, hit[4])
+        return hit[3], hit[4]
+
+    def _drop_favorite_keys(self, item):
+        """收藏条目被删除或编辑时调用：移出按条目缓存的 key，返回其 (内容 key, 描述 key)"""
+        hit = self._favorite_keys_cache.pop(id(item), None)
+        return hit[3:] if hit is not None else ()
+
+    def _forget_keys(self, keys):
+        """内容从历史或收藏夹移除后，把已不再被任何条目引用的 key 移出搜索索引。
+
+        同样的内容可能同时在历史和收藏夹里，仍被引用的 key 保留。
+        """
+        live_favorites = None
+        for key in keys:
+            if self.clipboard_history.has_key(key):
+                continue
+            if live_favorites is None:
+                live_favorites = {k for hit in list(self._favorite_keys_cache.values()) for k in hit[3:]}
+            if key not in live_favorites:
+                self.search_index.discard(key)
+
+    def _build_search_index(self):
+        """在后台线程按当前历史与收藏重建搜索索引，完成后搜索才改用索引。
+
+        历史与收藏的列表在界面线程先复制一份；之后新增的内容由搜索前的补登处理。
+        """
+        history_items = self.clipboard_history.items()
+        favorite_items = [item for items in list(self.favorites.values()) for item in list(items)]
+        # 旧版本保存在数据文件旁的索引文件已不再使用
+        old_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.clipboard_search_index')
+
+        def build():
+            try:
+                for key, entry in history_items:
+                    self._index_entry(entry, key)
+                for item in favorite_items:
+                    self._favorite_keys(item)
+                self.search_index.ready = True
+                print(f"搜索索引已建立：{len(self.search_index)} 段内容")
+                if os.path.exists(old_file):
+                    os.remove(old_file)
+            except Exception as e:
+                print(f"建立搜索索引失败，搜索将逐条核对: {e}")
+
+        threading.Thread(target=build, daemon=True).start()
 
 
     def hide(self):
         """写hide方法，同时隐藏预览窗口"""
+        self._latency_start = None   # 还没画出来就被隐藏（如热键切换），这次不计延迟
         super().hide()
         self.preview_window.hide()
 
-    def on_favorites_reordered(self, parent, start, end, destination, row):
-        """处理收藏列表重排序"""
-        # 获取移动的项目
-        moved_item = self.favorites[self.current_folder][start]
-        # 从原位置删除
-        self.favorites[self.current_folder].pop(start)
-        # 插入到新位置
-        new_position = row if row < start else row - 1
-        self.favorites[self.current_folder].insert(new_position, moved_item)
-        # 更新列表项编号
-        self.update_list_numbers(self.favorites_list)
+    def on_favorites_reordered(self, start, new_position):
+        """处理收藏列表拖放重排序"""
+        # 移动数据，列表同步移动这一行
+        self.move_entry(self.favorites[self.current_folder], start, new_position)
+        self.favorites_list.setCurrentRow(new_position)
         # 保存更新后的收藏列表
         self.save_favorites()
 
@@ -2490,36 +3358,6 @@ class ClipboardHistoryApp(QMainWindow):
         except Exception as e:
             print(f"保存配置出错: {e}")
 
-    def update_list_numbers(self, list_widget):
-        """更新列表项的编号"""
-        for i in range(list_widget.count()):
-            item = list_widget.item(i)
-            text = item.text()
-            # 移除可能存在的旧编号
-            # 查找编号模式: 数字., .数字., ..数字., ...数字. 等
-            import re
-            # 匹配开头的编号模式：可选的点号 + 数字 + 点号 + 空格
-            pattern = r'^(\.*\d+\. )'
-            match = re.match(pattern, text)
-            if match:
-                text = text[len(match.group(1)):]
-            
-            # 生成新编号
-            number = i + 1
-            if number <= 9:
-                # 1-9: 直接数字
-                prefix = f"{number}. "
-            else:
-                # 10及以上: 根据十位数确定点号数量
-                # 10-19: 1个点 (.10, .11, ...)
-                # 20-29: 2个点 (..20, ..21, ...)
-                # 30-39: 3个点 (...30, ...)
-                # 以此类推
-                dot_count = number // 10
-                prefix = f"{'.' * dot_count}{number}. "
-            
-            item.setText(f"{prefix}{text}")
-
     def show_favorites_context_menu(self, position):
         """显示收藏夹的右键菜单"""
         menu = QMenu()
@@ -2564,11 +3402,9 @@ class ClipboardHistoryApp(QMainWindow):
                 
                 # 从当前收藏夹移除
                 current_row = self.favorites_list.currentRow()
-                self.favorites[self.current_folder].pop(current_row)
-                self.favorites_list.takeItem(current_row)
+                self.pop_entry(self.favorites[self.current_folder], current_row)
                 
                 self.save_favorites()
-                self.update_list_numbers(self.favorites_list)
             else:
                 QMessageBox.warning(self, "错误", "收藏夹名称已存在!")
 
@@ -2579,16 +3415,15 @@ class ClipboardHistoryApp(QMainWindow):
             if not isinstance(item, dict):
                 item = {"text": str(item), "description": ""}
             
-            # 添加到目标收藏夹
-            self.favorites[target_folder].append(item)
-            
-            # 从当前收藏夹移除
+            # 先从当前收藏夹移除，再添加到目标收藏夹（两边的常驻模型与显示缓存同步增减一行，
+            # 搜索索引里的 key 由移除时淘汰、添加时重新登记）
             current_row = self.favorites_list.currentRow()
-            self.favorites[self.current_folder].pop(current_row)
-            self.favorites_list.takeItem(current_row)
+            self.pop_entry(self.favorites[self.current_folder], current_row)
+            
+            target_items = self.favorites[target_folder]
+            self.insert_entry(target_items, len(target_items), item)
             
             self.save_favorites()
-            self.update_list_numbers(self.favorites_list)
 
     def move_to_folder_from_history(self, item, target_folder):
         """移动条目到指定收藏夹"""
@@ -2601,15 +3436,9 @@ class ClipboardHistoryApp(QMainWindow):
                 # 确保使用字典格式
                 new_item = {"text": text, "description": ""}
                 
-                # 添加到目标收藏夹
-                self.favorites[target_folder].append(new_item)
-                
-                # 更新显示
-                truncated_text = self.truncate_text(text)
-                self.favorites_list.insertItem(0, truncated_text)
-                
-                # 更新编号
-                self.update_list_numbers(self.favorites_list)
+                # 添加到目标收藏夹（正在显示时列表同步增加一行）
+                target_items = self.favorites[target_folder]
+                self.insert_entry(target_items, len(target_items), new_item)
                 
                 # 保存更改
                 self.save_favorites()
@@ -2641,17 +3470,14 @@ class ClipboardHistoryApp(QMainWindow):
             self.folder_combo.addItem(MEMORY_FOLDER)
 
         # 待发队列里已有相同文本（含正在发送中的）则不重复加入
-        pending_texts = {(it["text"] if isinstance(it, dict) else str(it))
-                         for it in self.favorites[MEMORY_FOLDER]}
-        if text in pending_texts:
+        if any(same_content(it["text"] if isinstance(it, dict) else str(it), text)
+               for it in self.favorites[MEMORY_FOLDER]):
             self.show_toast("失败,记忆文件夹中已存在相同条目", 1500)
             return False
 
         # 先放入本地待发队列（同步成功前不丢）
-        self.favorites[MEMORY_FOLDER].append({"text": text, "description": ""})
-        if self.current_folder == MEMORY_FOLDER:
-            self.favorites_list.addItem(self.truncate_text(text))
-            self.update_list_numbers(self.favorites_list)
+        memory_items = self.favorites[MEMORY_FOLDER]
+        self.insert_entry(memory_items, len(memory_items), {"text": text, "description": ""})
 
         self.show_toast("正在同步记忆到云端…", 1000)
         self._flush_pending_memory()
@@ -2671,10 +3497,17 @@ class ClipboardHistoryApp(QMainWindow):
             self._append_workers = []          # 持有运行中的线程，防止被回收
 
         for item in list(self.favorites.get(MEMORY_FOLDER, [])):
-            text = item["text"] if isinstance(item, dict) else str(item)
-            if not text or text in self._memory_inflight:
+            entry = item["text"] if isinstance(item, dict) else str(item)
+            if not entry:
+                continue
+            if only_text is not None and not same_content(entry, only_text):
+                continue
+            try:
+                text = self._entry_text(entry)   # 外置的大内容读回全文再上传
+            except BlobMissingError as e:
+                print(f"跳过上传记忆: {e}")
                 continue
-            if only_text is not None and text != only_text:
+            if text in self._memory_inflight:
                 continue
             self._memory_inflight.add(text)
             worker = CloudAppendWorker(self.d1, MEMORY_FOLDER, text, self)
@@ -2695,11 +3528,9 @@ class ClipboardHistoryApp(QMainWindow):
             lst = self.favorites.get(MEMORY_FOLDER, [])
             for i, item in enumerate(lst):
                 existing = item["text"] if isinstance(item, dict) else str(item)
-                if existing == text:
-                    lst.pop(i)
+                if same_content(existing, text):
+                    self.pop_entry(lst, i)  # 正在显示时列表同步删除该行
                     break
-            if self.current_folder == MEMORY_FOLDER:
-                self.change_folder(MEMORY_FOLDER)  # 刷新列表显示
             self.show_toast("成功,记忆已同步到云端", 1500)
         else:
             # 失败：保留在本地待发队列，下次添加新记忆或重启后会重试
@@ -2711,7 +3542,11 @@ class ClipboardHistoryApp(QMainWindow):
         if current_row < 0 or current_row >= len(self.clipboard_history):
             return
 
-        text = self.clipboard_history[current_row]
+        try:
+            text = self._entry_text(self.clipboard_history[current_row])
+        except BlobMissingError as e:
+            self._warn_missing_blob(e)
+            return
         self._send_to_memory(text)
 
     def upload_selected_memory_to_cloud(self):
@@ -2847,27 +3682,41 @@ class ClipboardHistoryApp(QMainWindow):
         """切换当前收藏夹"""
         if folder_name in self.favorites:
             self.current_folder = folder_name
-            self.favorites_list.clear()
-            for item in self.favorites[folder_name]:
-                # 确保使用字典格式
-                if isinstance(item, dict):
-                    text = item["text"]
-                else:
-                    # 如果是旧格式，转换为新格式
-                    text = str(item)
-                    item = {"text": text, "description": ""}
-                
-                truncated_text = self.truncate_text(text)
-                self.favorites_list.addItem(truncated_text)
-            self.update_list_numbers(self.favorites_list)
+            # 换上该收藏夹的常驻模型：不重置、不重建
+            self._show_favorites_model(self.favorite_models.get(self.favorites[folder_name]))
+
+    def _show_favorites_model(self, model):
+        """让收藏列表显示 model，已是当前模型时什么都不做"""
+        if model is self.favorites_model:
+            return
+        view = self.favorites_list
+        self.favorite_models.keep_selection(self.favorites_model, view.selectionModel())
+        view.setModel(model)
+        # setModel 会新建选择模型；该收藏夹显示过时换回原来的，当前行随之恢复
+        saved = self.favorite_models.selection(model)
+        if saved is not None:
+            created = view.selectionModel()
+            view.setSelectionModel(saved)
+            created.deleteLater()
+        self.favorites_model = model
+
+    def _detach_favorites_model(self, model):
+        """收藏夹模型释放前调用：视图正显示它时先换成空模型"""
+        if model is self.favorites_model:
+            self._show_favorites_model(self.empty_favorites_model)
 
     def edit_favorite_content_and_description(self, row):
         """编辑收藏条目的内容和描述"""
         if 0 <= row < len(self.favorites[self.current_folder]):
             favorite_item = self.favorites[self.current_folder][row]
+            try:
+                full_text = self._item_text(favorite_item)
+            except BlobMissingError as e:
+                self._warn_missing_blob(e)
+                return
             dialog = DescriptionDialog(
                 self,
-                text=favorite_item["text"],
+                text=full_text,
                 description=favorite_item.get("description", "")
             )
             
@@ -2875,13 +3724,17 @@ class ClipboardHistoryApp(QMainWindow):
                 new_description = dialog.get_description()
                 new_content = dialog.get_content()
                 
-                # 更新收藏夹中的内容
-                favorite_item["text"] = new_content
+                # 更新收藏夹中的内容（大内容放入外置存储）
+                old_keys = self._drop_favorite_keys(favorite_item)
+                favorite_item["text"] = self.blob_store.externalize(new_content)
                 favorite_item["description"] = new_description
+                # 更新显示缓存中的这一条，为新内容建索引，并淘汰旧内容的 key
+                self.favorites_display.update(self.favorites[self.current_folder], favorite_item)
+                self._favorite_keys(favorite_item)
+                self._forget_keys(old_keys)
                 
-                # 更新显示的文本
-                truncated_text = self.truncate_text(new_content)
-                self.favorites_list.item(row).setText(f"{row+1}. {truncated_text}")
+                # 重绘这一行
+                self.favorites_model.refresh(row)
                 
                 # 保存更改
                 self.save_favorites()
@@ -2940,7 +3793,10 @@ class ClipboardHistoryApp(QMainWindow):
         
         if reply == QMessageBox.StandardButton.Yes:
             # 删除收藏夹
-            del self.favorites[self.current_folder]
+            entries = self.favorites.pop(self.current_folder)
+            self.favorites_display.drop(entries)
+            self.favorite_models.drop(entries)
+            self._forget_keys([key for item in entries for key in self._drop_favorite_keys(item)])
             
             # 从下拉菜单中移除
             current_index = self.folder_combo.currentIndex()
@@ -3058,33 +3914,30 @@ class ClipboardHistoryApp(QMainWindow):
         """删除选中的历史条目"""
         current_row = self.history_list.currentRow()
         if current_row >= 0:  # 确保有选中的项目
-            # 从数据中删除
-            self.clipboard_history.pop(current_row)
-            # 从列表控件中删除
-            self.history_list.takeItem(current_row)
-            # 更新编号
-            self.update_list_numbers(self.history_list)
+            # 从数据中删除（列表同步删除该行）
+            deleted_text = self.pop_entry(self.clipboard_history, current_row)
             # 保存更改
-            self.save_history()
+            self.history_store.record_delete(deleted_text)
 
     def edit_history_item(self, row):
         """编辑历史条目的内容"""
         if 0 <= row < len(self.clipboard_history):
             original_text = self.clipboard_history[row]
-            dialog = EditItemDialog(self, text=original_text)
+            try:
+                full_text = self._entry_text(original_text)
+            except BlobMissingError as e:
+                self._warn_missing_blob(e)
+                return
+            dialog = EditItemDialog(self, text=full_text)
             
             if dialog.exec() == QDialog.DialogCode.Accepted:
-                new_text = dialog.get_text()
-                
-                # 更新历史记录中的内容
-                self.clipboard_history[row] = new_text
+                new_text = self.blob_store.externalize(dialog.get_text())
                 
-                # 更新显示的文本
-                truncated_text = self.truncate_text(new_text)
-                self.history_list.item(row).setText(f"{row+1}. {truncated_text}")
+                # 更新历史记录中的内容（列表同步重绘）
+                self.replace_entry(self.clipboard_history, row, new_text)
                 
                 # 保存更改
-                self.save_history()
+                self.history_store.record_edit(original_text, new_text)
 
     def show_search_dialog(self):
         """显示/关闭搜索对话框（toggle）"""
@@ -3100,107 +3953,202 @@ class ClipboardHistoryApp(QMainWindow):
         self._search_dialog.destroyed.connect(lambda: setattr(self, '_search_dialog', None))
         self._search_dialog.exec()
     
-    def search_items(self, search_text, use_regex, scope, case_sensitive=False, whole_word=False):
-        """搜索项目"""
-        results = []
+    def search_items(self, search_text, use_regex, scope, case_sensitive=False, whole_word=False, fuzzy=False):
+        """搜索项目（同步执行，返回全部结果）"""
+        return list(self.iter_search(search_text, use_regex, scope, case_sensitive, whole_word, fuzzy))
+
+    def search_snapshot(self, scope):
+        """在界面线程取出本次搜索要用的数据（只复制引用），供后台线程搜索。
+
+        返回 (历史 (key, 条目) 列表, [(收藏夹名, 条目列表), ...])；之后界面线程
+        再修改历史或收藏夹都不影响正在进行的搜索。
+        """
+        history_items = self.clipboard_history.items() if scope in ["全部", "历史记录"] else []
+        folders = []
+        if scope in ["全部", "所有收藏夹", "当前收藏夹"] or scope.startswith("收藏夹-"):
+            # 确定要搜索的收藏夹
+            if scope == "当前收藏夹":
+                names = [self.current_folder]
+            elif scope.startswith("收藏夹-"):
+                names = [scope[4:]]  # 去掉"收藏夹-"前缀
+            else:
+                # "全部"或"所有收藏夹"
+                names = list(self.favorites.keys())
+            for folder in names:
+                if folder not in self.favorites:
+                    print(f"收藏夹 {folder} 不存在")
+                    continue
+                folders.append((folder, list(self.favorites[folder])))
+        return history_items, folders
+
+    def iter_search(self, search_text, use_regex, scope, case_sensitive=False, whole_word=False,
+                    fuzzy=False, snapshot=None, cancelled=None):
+        """逐条产生搜索结果 (来源, 条目, 描述, 命中位置, 内容 key)。
+
+        条目为历史或收藏里保存的内容本身（str 或外置的 BlobRef），匹配时才读回全文，
+        结果里不保留全文；粘贴、编辑时再按需读回。命中位置为内容中第一处命中的
+        (起点, 终点)，在搜索线程中算好供结果列表显示片段；只有描述命中时为 None。
+
+        fuzzy 为 True 时按模糊得分排序（见 _iter_fuzzy_search），忽略正则与全字匹配。
+        snapshot 为 search_snapshot() 的返回值（后台搜索时在界面线程预先取好），
+        cancelled() 返回 True 时尽快结束（查询已被新的输入作废）。
+        """
         print(f"开始搜索: 文本='{search_text}', 范围='{scope}'")  # 调试输出
+        if snapshot is None:
+            snapshot = self.search_snapshot(scope)
+        if fuzzy:
+            yield from self._iter_fuzzy_search(search_text, case_sensitive, snapshot, cancelled)
+            return
+        history_items, folders = snapshot
+        search_history = scope in ["全部", "历史记录"]
+        found = 0
+        # 查询只编译一次，之后每个条目只做一次比较
+        matcher = QueryMatcher(search_text, use_regex, case_sensitive, whole_word)
+        forms = self.search_forms
         
         try:
+            # 非正则搜索先查 n-gram 索引得到候选（全字匹配、区分大小写都是子串匹配的子集），
+            # 只核对候选；索引还在后台建立、或查询太短无法用索引时 candidates 为 None，逐条核对
+            candidates = None
+            if not use_regex and search_text and self.search_index.ready:
+                for key, item in history_items:
+                    self._index_entry(item, key)   # 补上尚未建索引的内容
+                for folder, items in folders:
+                    for item in items:
+                        self._favorite_keys(item)
+                candidates = self.search_index.candidates(search_text)
+
             # 搜索历史记录
-            if scope in ["全部", "历史记录"]:
+            if search_history:
                 print("搜索历史记录...")  # 调试输出
-                for i, item in enumerate(self.clipboard_history):
-                    text = str(item)  # 确保是字符串
-                    
-                    if self.match_text(text, "", search_text, use_regex, case_sensitive, whole_word):
-                        results.append(("历史记录", text, ""))
+                # 普通子串搜索优先查存储引擎的全文索引（SQLite 时覆盖全部历史），
+                # 不支持时返回 None，退回内存中的历史
+                indexed = None
+                if not use_regex and not whole_word:
+                    indexed = self.history_store.search(search_text, case_sensitive)
+                if indexed is not None:
+                    for entry in indexed:
+                        if cancelled and cancelled():
+                            return
+                        text = self._search_text(entry)
+                        if text is None:
+                            continue
+                        found += 1
+                        yield ("历史记录", entry, "", matcher.find(text), entry_key(entry))
+                else:
+                    for key, item in history_items:
+                        if cancelled and cancelled():
+                            return
+                        if candidates is not None and key not in candidates:
+                            continue
+                        text = self._search_text(item)  # 外置的大内容读回全文
+                        if text is None:
+                            continue
+                        
+                        if matcher.matches(forms.get(key, text)):
+                            found += 1
+                            yield ("历史记录", item, "", matcher.find(text), key)
             
             # 搜索收藏夹
-            if scope in ["全部", "所有收藏夹", "当前收藏夹"] or scope.startswith("收藏夹-"):
+            if folders:
                 print("搜索收藏夹...")  # 调试输出
+                print(f"要搜索的收藏夹: {[folder for folder, _ in folders]}")  # 调试输出
                 
-                # 确定要搜索的收藏夹
-                if scope == "当前收藏夹":
-                    folders = [self.current_folder]
-                elif scope.startswith("收藏夹-"):
-                    folder_name = scope[4:]  # 去掉"收藏夹-"前缀
-                    folders = [folder_name] if folder_name in self.favorites else []
-                else:
-                    # "全部"或"所有收藏夹"
-                    folders = list(self.favorites.keys())
-                
-                print(f"要搜索的收藏夹: {folders}")  # 调试输出
-                
-                for folder in folders:
-                    if folder not in self.favorites:
-                        print(f"收藏夹 {folder} 不存在")
-                        continue
-                        
-                    print(f"搜索收藏夹 {folder} 中的 {len(self.favorites[folder])} 个项目")
-                    for item in self.favorites[folder]:
+                for folder, items in folders:
+                    print(f"搜索收藏夹 {folder} 中的 {len(items)} 个项目")
+                    for item in items:
+                        if cancelled and cancelled():
+                            return
+                        text_key, desc_key = self._favorite_keys(item)
+                        if candidates is not None and text_key not in candidates and desc_key not in candidates:
+                            continue
                         if isinstance(item, dict):
-                            text = item.get("text", "")
+                            entry = item.get("text", "")
                             description = item.get("description", "")
                         else:
-                            text = str(item)
+                            entry = str(item)
                             description = ""
+                        text = self._search_text(entry)
+                        if text is None:
+                            continue
                         
-                        if self.match_text(text, description, search_text, use_regex, case_sensitive, whole_word):
-                            results.append((f"收藏夹-{folder}", text, description))
+                        # 命中位置只在内容命中时查找（只有描述命中时从开头显示）
+                        if matcher.matches(forms.get(text_key, text)):
+                            found += 1
+                            yield (f"收藏夹-{folder}", entry, description, matcher.find(text), text_key)
+                        elif matcher.matches(forms.get(desc_key, description or "")):
+                            found += 1
+                            yield (f"收藏夹-{folder}", entry, description, None, text_key)
             
-            print(f"搜索完成，找到 {len(results)} 个结果")  # 调试输出
-            return results
+            print(f"搜索完成，找到 {found} 个结果")  # 调试输出
             
         except Exception as e:
             print(f"搜索出错: {str(e)}")  # 调试输出
             traceback.print_exc()
             raise e
     
-    def match_text(self, text, description, pattern, use_regex, case_sensitive, whole_word):
-        """匹配文本"""
-        if use_regex:
-            try:
-                # 正则表达式搜索
-                flags = 0 if case_sensitive else re.IGNORECASE
-                if whole_word:
-                    # 全字匹配的正则表达式
-                    pattern = r'\b' + pattern + r'\b'
-                if bool(re.search(pattern, text, flags)):
-                    return True
-                elif bool(re.search(pattern, description, flags)):
-                    return True
-                else:
-                    return False
-            except re.error:
-                # 正则表达式错误，使用普通搜索
-                if self.normal_search(text, pattern, case_sensitive, whole_word):
-                    return True
-                elif self.normal_search(description, pattern, case_sensitive, whole_word):
-                    return True
+    def _iter_fuzzy_search(self, search_text, case_sensitive, snapshot, cancelled=None):
+        """模糊排序：逐条打分，用大小为 k 的最小堆只保留得分最高的 k 条，最后按得分产生。
+
+        k（fuzzy_top_k）与描述得分的权重（fuzzy_description_weight）可在配置文件中设置。
+        得分相同时保持原来的顺序（历史在前，越新越靠前）。
+        """
+        history_items, folders = snapshot
+        top_k = max(1, int(self.config.get('fuzzy_top_k', 200)))   # 配置为 0 或负数时至少保留 1 条
+        matcher = FuzzyMatcher(search_text, case_sensitive,
+                               float(self.config.get('fuzzy_description_weight', 0.5)))
+        forms = self.search_forms
+        heap = []   # (得分, -顺序号, 结果)
+        order = 0
+
+        def offer(score, result):
+            entry = (score, -order, result)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+        for key, item in history_items:
+            if cancelled and cancelled():
+                return
+            order += 1
+            text = self._search_text(item)
+            if text is None:
+                continue
+            match = matcher.match(forms.get(key, text))
+            if match is not None:
+                offer(match[0], ("历史记录", item, "", match[1], key))
+        for folder, items in folders:
+            for item in items:
+                if cancelled and cancelled():
+                    return
+                order += 1
+                text_key, desc_key = self._favorite_keys(item)
+                if isinstance(item, dict):
+                    entry = item.get("text", "")
+                    description = item.get("description", "") or ""
                 else:
-                    return False
-        else:
-            # 普通搜索
-            if self.normal_search(text, pattern, case_sensitive, whole_word):
-                return True
-            elif self.normal_search(description, pattern, case_sensitive, whole_word):
-                return True
-            else:
-                return False
+                    entry = str(item)
+                    description = ""
+                text = self._search_text(entry)
+                if text is None:
+                    continue
+                match = matcher.match(forms.get(text_key, text), forms.get(desc_key, description))
+                if match is not None:
+                    offer(match[0], (f"收藏夹-{folder}", entry, description, match[1], text_key))
+
+        print(f"模糊搜索完成，保留得分最高的 {len(heap)} 个结果")  # 调试输出
+        for score, _, result in sorted(heap, key=lambda e: e[:2], reverse=True):
+            yield result
+
+    def match_text(self, text, description, pattern, use_regex, case_sensitive, whole_word):
+        """匹配文本（单条匹配；批量搜索见 iter_search，查询只编译一次）"""
+        matcher = QueryMatcher(pattern, use_regex, case_sensitive, whole_word)
+        return matcher.matches_any(NormalizedText(text), NormalizedText(description))
     
     def normal_search(self, text, pattern, is_case_sensitive, is_whole_word):
         """执行普通文本搜索"""
-        if not is_case_sensitive:
-            text = text.lower()
-            pattern = pattern.lower()
-        
-        if is_whole_word:
-            # 全字匹配
-            words = re.findall(r'\b\w+\b', text)
-            return pattern in words
-        else:
-            # 普通包含匹配
-            return pattern in text
+        return QueryMatcher(pattern, False, is_case_sensitive, is_whole_word).matches(NormalizedText(text))
 
 def get_resource_path(relative_path):
     """获取资源文件的绝对路径"""
@@ -3278,6 +4226,7 @@ def main():
 
     window = ClipboardHistoryApp()
     window.hide()  # 初始隐藏窗口
+    window.prewarm_window()  # 提前创建原生窗口，热键首次唤出时无需等待
 
     # 阻止 Python 解释器退出
     app.setQuitOnLastWindowClosed(False)
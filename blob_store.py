@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""大内容的外置存储（按内容寻址、压缩保存）。
+
+历史记录和收藏夹原本把每条内容原样放在列表里：复制一次 50MB 的日志后，它会一直
+占着内存，并在之后每次保存历史时被整段重写。
+
+超过阈值的内容改为只保存一次到 .clipboard_blobs/ 目录（文件名即内容哈希，zlib
+压缩），列表里只留一个 BlobRef（哈希、大小、开头一小段预览）。真正粘贴或预览时
+才用 BlobStore.resolve() 读回全文。
+
+BlobRef 之间按内容哈希比较；与 str 比较内容请用 same_content()（BlobRef 与 str
+的哈希值不同，不能直接混放在 set/dict 里比较）。序列化时用 entry_to_json /
+entry_from_json 转成 {"blob": ...}。
+
+内容文件缺失或损坏时 resolve() 抛出 BlobMissingError：粘贴、编辑、上传必须拿到
+全文，不能拿预览顶替；只做显示、搜索的地方用 resolve_or_preview()。
+"""
+
+import os
+import zlib
+import hashlib
+import threading
+
+from history_index import content_key, entry_key
+
+
+# 超过这个字符数的内容放入外置存储
+BLOB_THRESHOLD = 64 * 1024
+# BlobRef 保留的预览字符数
+BLOB_PREVIEW_CHARS = 200
+
+
+class BlobMissingError(OSError):
+    """外置内容文件缺失或损坏，无法读回全文。"""
+
+
+class BlobRef:
+    """外置大内容的引用：只含内容哈希、字符数和开头的预览。"""
+
+    __slots__ = ("key", "size", "preview")
+
+    def __init__(self, key, size, preview):
+        self.key = key
+        self.size = size
+        self.preview = preview
+
+    def __eq__(self, other):
+        if isinstance(other, BlobRef):
+            return self.key == other.key
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"BlobRef({self.key[:8]}…, {self.size} chars)"
+
+    def to_json(self):
+        return {"blob": self.key, "size": self.size, "preview": self.preview}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["blob"], data.get("size", 0), data.get("preview", ""))
+
+
+def same_content(a, b):
+    """两个条目（str 或 BlobRef）的内容是否相同；涉及 BlobRef 时按内容哈希比较。"""
+    if isinstance(a, BlobRef) or isinstance(b, BlobRef):
+        return len(a) == len(b) and entry_key(a) == entry_key(b)
+    return a == b
+
+
+def entry_to_json(entry):
+    """历史条目 -> 可 JSON 序列化的对象（str 原样返回）。"""
+    return entry.to_json() if isinstance(entry, BlobRef) else entry
+
+
+def entry_from_json(data):
+    """entry_to_json 的逆操作。"""
+    if isinstance(data, dict) and "blob" in data:
+        return BlobRef.from_json(data)
+    return data
+
+
+class BlobStore:
+    """按内容哈希寻址的压缩文件目录。"""
+
+    def __init__(self, directory, threshold=BLOB_THRESHOLD):
+        self.directory = directory
+        self.threshold = threshold
+        self._last = None   # 最近一次读回的 (key, text)，连续预览/粘贴同一条时免去重复解压
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.z')
+
+    def externalize(self, text, key=None):
+        """超过阈值的文本写入存储并返回 BlobRef，否则原样返回。"""
+        if not isinstance(text, str) or len(text) <= self.threshold:
+            return text
+        key = key or content_key(text)
+        path = self._path(key)
+        if not os.path.exists(path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(zlib.compress(text.encode('utf-8', 'surrogatepass'), 6))
+                os.replace(tmp_path, path)
+            except Exception as e:
+                # 写不进外置存储就仍然内联保存，绝不丢内容
+                print(f"写入大内容存储失败，改为内联保存: {e}")
+                return text
+        return BlobRef(key, len(text), text[:BLOB_PREVIEW_CHARS])
+
+    def externalize_stream(self, chunks):
+        """把分块给出的超大文本边压缩边写入存储，全程不拼出整段 str。
+
+        哈希与 content_key() 对整段文本算出的一致。失败时返回 None，由调用方兜底。
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        compressor = zlib.compressobj(6)
+        size = 0
+        preview = None
+        tmp_path = os.path.join(self.directory, f'stream-{os.getpid()}-{threading.get_ident()}.tmp')
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    if preview is None:
+                        preview = chunk[:BLOB_PREVIEW_CHARS]
+                    data = chunk.encode('utf-8', 'surrogatepass')
+                    hasher.update(data)
+                    f.write(compressor.compress(data))
+                    size += len(chunk)
+                f.write(compressor.flush())
+            key = hasher.hexdigest()
+            path = self._path(key)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"流式写入大内容存储失败: {e}")
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
+            return None
+        return BlobRef(key, size, preview or '')
+
+    def resolve(self, entry):
+        """返回条目的完整文本：str 原样返回，BlobRef 从存储读回。
+
+        内容文件缺失或损坏时抛出 BlobMissingError。
+        """
+        if not isinstance(entry, BlobRef):
+            return entry
+        last = self._last
+        if last is not None and last[0] == entry.key:
+            return last[1]
+        try:
+            with open(self._path(entry.key), 'rb') as f:
+                text = zlib.decompress(f.read()).decode('utf-8', 'surrogatepass')
+        except Exception as e:
+            print(f"读取大内容 {entry.key} 失败: {e}")
+            raise BlobMissingError(f"大内容 {entry.key[:8]}… 的文件缺失或已损坏") from e
+        self._last = (entry.key, text)
+        return text
+
+    def resolve_or_preview(self, entry):
+        """只用于显示、搜索：读不回全文时返回 BlobRef 自带的预览。"""
+        try:
+            return self.resolve(entry)
+        except BlobMissingError:
+            return entry.preview
+
+    def collect(self, live_keys):
+        """删除不再被任何条目引用的内容文件，返回删除的个数。"""
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return 0
+        for sub in os.listdir(self.directory):
+            sub_dir = os.path.join(self.directory, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                key = name[:-2] if name.endswith('.z') else None
+                if key is not None and key not in live_keys:
+                    try:
+                        os.remove(os.path.join(sub_dir, name))
+                        removed += 1
+                    except Exception as e:
+                        print(f"清理大内容 {name} 失败: {e}")
+        return removed
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""剪贴板变化检测模块。
+
+原先主程序每 500ms 调用 clipboard.text() 与上次文本比较：即使剪贴板没变，也会
+把整段内容复制成 Python 字符串，复制几 MB 的内容时会持续占用 CPU。
+
+这里把“剪贴板有没有变”抽象成一个单调递增的序号，读取序号的开销与内容大小无关：
+- Win32SequenceBackend：Windows 的 GetClipboardSequenceNumber，读一个整数；
+- QtSignalBackend：其它平台用 QClipboard.dataChanged 信号自增计数；
+- FakeClipboardBackend：无界面环境（如 Linux 下调试）手动模拟复制。
+
+主程序的定时器只比较序号，序号前进时才真正读取文本。
+
+CapturePipeline 把 dataChanged 信号与定时轮询汇成唯一的捕获入口：同一序号只处理
+一次，短时间内的连续通知合并为一次读取，重复的通知计入 dropped。
+
+CaptureWorker 把读取之后的工作（规整、算内容哈希、外置大内容）放到后台线程，
+界面线程只收到一条“把这个条目放到最前”的增量；Windows 下连读取剪贴板本身也在
+后台线程完成（Win32 API 可在任意线程调用，QClipboard 只能在界面线程使用）。
+
+read_capture(threshold) 先看剪贴板内容有多大：不超过阈值时照常读成 str；超过时
+只把原始 UTF-16 数据拷出（随即释放剪贴板），包成 LargeClipboardText，预览只解码
+开头一小段，全文由 chunks() 分块解码后直接流式写入外置存储，不会拼出整段 str。
+仅使用标准库，Qt 对象由调用方传入，便于在无 Qt 的环境下单独使用。
+"""
+
+import sys
+import time
+import codecs
+import ctypes
+import queue
+import threading
+
+
+class LargeClipboardText:
+    """超过阈值的剪贴板文本：只保存原始 UTF-16-LE 字节，按需分块解码。"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def prefix(self, max_chars):
+        """只解码开头 max_chars 个字符左右，用于预览。"""
+        for chunk in self.chunks(max_chars):
+            return chunk
+        return ''
+
+    def chunks(self, chunk_chars=1 << 20):
+        """逐块解码为 str（遇到结尾的 NUL 即停止），可重复调用。"""
+        decoder = codecs.getincrementaldecoder('utf-16-le')('surrogatepass')
+        step = chunk_chars * 2
+        for start in range(0, len(self.raw), step):
+            chunk = decoder.decode(self.raw[start:start + step])
+            end = chunk.find('\x00')
+            if end >= 0:
+                if end:
+                    yield chunk[:end]
+                return
+            if chunk:
+                yield chunk
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    def text(self):
+        """拼出完整文本（仅在外置存储不可用时兜底）。"""
+        return ''.join(self.chunks())
+
+
+def win32_clipboard_payload(threshold):
+    """按大小读取剪贴板：不超过 threshold 个字符时返回 str，否则返回 LargeClipboardText。
+
+    剪贴板被占用时返回 None。
+    """
+    CF_UNICODETEXT = 13
+    u = ctypes.windll.user32
+    k = ctypes.windll.kernel32
+    if not u.OpenClipboard(0):
+        return None
+    try:
+        h = u.GetClipboardData(CF_UNICODETEXT)
+        if not h:
+            return ''
+        k.GlobalLock.restype = ctypes.c_void_p
+        k.GlobalLock.argtypes = [ctypes.c_void_p]
+        k.GlobalSize.restype = ctypes.c_size_t
+        k.GlobalSize.argtypes = [ctypes.c_void_p]
+        ptr = k.GlobalLock(h)
+        if not ptr:
+            return ''
+        try:
+            size = k.GlobalSize(h)
+            if size // 2 <= threshold:
+                return ctypes.c_wchar_p(ptr).value
+            # 只做一次内存拷贝就释放剪贴板，解码与写盘留给调用方分块进行
+            return LargeClipboardText(ctypes.string_at(ptr, size))
+        finally:
+            k.GlobalUnlock(h)
+    finally:
+        u.CloseClipboard()
+
+
+def win32_clipboard_text():
+    """用 Windows API 直接读取剪贴板里的 Unicode 文本；剪贴板被占用时返回 None。"""
+    CF_UNICODETEXT = 13
+    u = ctypes.windll.user32
+    k = ctypes.windll.kernel32
+    if not u.OpenClipboard(0):
+        return None
+    try:
+        h = u.GetClipboardData(CF_UNICODETEXT)
+        if not h:
+            return ''
+        k.GlobalLock.restype = ctypes.c_void_p
+        k.GlobalLock.argtypes = [ctypes.c_void_p]
+        ptr = k.GlobalLock(h)
+        if not ptr:
+            return ''
+        try:
+            return ctypes.c_wchar_p(ptr).value
+        finally:
+            k.GlobalUnlock(h)
+    finally:
+        u.CloseClipboard()
+
+
+class ClipboardBackend:
+    """变化检测后端的公共接口。"""
+
+    name = "base"
+    # read_text 能否在非界面线程调用（决定捕获线程能否自己读取）
+    thread_safe_read = False
+
+    def sequence(self):
+        """返回当前剪贴板序号；内容每变化一次序号至少加 1。"""
+        raise NotImplementedError
+
+    def read_text(self):
+        """读取剪贴板当前的完整文本（只在序号前进后调用）。"""
+        raise NotImplementedError
+
+    def read_capture(self, threshold):
+        """按大小读取：返回 str，或超过 threshold 个字符时的 LargeClipboardText。
+
+        默认实现无法预先知道大小，总是完整读取。
+        """
+        return self.read_text()
+
+
+class Win32SequenceBackend(ClipboardBackend):
+    """Windows：直接读取系统维护的剪贴板序号，文本经 Win32 API 读取（可在后台线程）。"""
+
+    name = "win32"
+    thread_safe_read = True
+
+    def __init__(self, clipboard):
+        self.clipboard = clipboard
+        self._get_seq = ctypes.windll.user32.GetClipboardSequenceNumber
+        self._get_seq.restype = ctypes.c_uint32
+
+    def sequence(self):
+        return int(self._get_seq())
+
+    def read_text(self):
+        return self._retry(win32_clipboard_text)
+
+    def read_capture(self, threshold):
+        return self._retry(lambda: win32_clipboard_payload(threshold))
+
+    @staticmethod
+    def _retry(read):
+        # 剪贴板可能正被写入方占用，稍等重试几次
+        for _ in range(5):
+            text = read()
+            if text is not None:
+                return text
+            time.sleep(0.02)
+        return ''
+
+
+class QtSignalBackend(ClipboardBackend):
+    """非 Windows 平台：以 QClipboard.dataChanged 信号计数作为序号。"""
+
+    name = "qt"
+
+    def __init__(self, clipboard):
+        self.clipboard = clipboard
+        self._seq = 0
+        clipboard.dataChanged.connect(self._bump)
+
+    def _bump(self):
+        self._seq += 1
+
+    def sequence(self):
+        return self._seq
+
+    def read_text(self):
+        return self.clipboard.text()
+
+
+class FakeClipboardBackend(ClipboardBackend):
+    """内存中的假剪贴板：set_text 模拟一次外部复制，用于无界面环境。"""
+
+    name = "fake"
+    thread_safe_read = True
+
+    def __init__(self, text=""):
+        self._text = text
+        self._seq = 0
+        self.reads = 0  # read_text 被调用的次数，便于确认没有多余的读取
+
+    def set_text(self, text):
+        self._text = text
+        self._seq += 1
+
+    def sequence(self):
+        return self._seq
+
+    def read_text(self):
+        self.reads += 1
+        return self._text
+
+    def read_capture(self, threshold):
+        if len(self._text) <= threshold:
+            return self.read_text()
+        self.reads += 1
+        return LargeClipboardText(self._text.encode('utf-16-le', 'surrogatepass'))
+
+
+def create_backend(clipboard):
+    """按平台选择变化检测后端：Windows 优先用系统序号，失败则退回 Qt 信号计数。"""
+    if sys.platform == "win32":
+        try:
+            return Win32SequenceBackend(clipboard)
+        except Exception as e:
+            print(f"无法使用 GetClipboardSequenceNumber，改用 Qt 信号检测: {e}")
+    return QtSignalBackend(clipboard)
+
+
+class CapturePipeline:
+    """单一来源的剪贴板捕获管线：每个不同的剪贴板序号只交给 handler 处理一次。
+
+    notify() 接 dataChanged 信号，poll() 接定时器；二者都只登记“序号可能前进了”，
+    真正的读取在合并窗口（window_ms）结束后统一进行，窗口内的后续通知直接丢弃。
+    schedule(delay_ms, fn) 由调用方提供（主程序传 QTimer.singleShot）；为 None 时
+    立即处理，便于在无事件循环的环境下使用。
+    defer_read 为 True 且后端支持跨线程读取时，不在这里读取，handler 收到的 text
+    为 None，由捕获线程自己去读。
+    """
+
+    def __init__(self, backend, handler, window_ms=80, schedule=None, defer_read=False):
+        self.backend = backend
+        self.handler = handler          # handler(text, seq)
+        self.window_ms = window_ms
+        self.schedule = schedule
+        self.defer_read = defer_read and backend.thread_safe_read
+        self._last_seq = backend.sequence()
+        self._pending = False
+        self.processed = 0              # 已交给 handler 的变化次数
+        self.dropped = 0                # 被丢弃的重复通知次数
+        self.suppressed = 0             # 被跳过的本程序自身写入次数
+
+    def notify(self):
+        """剪贴板变化通知（dataChanged）。同一序号的重复通知计入 dropped。"""
+        seq = self.backend.sequence()
+        if seq == self._last_seq or self._pending:
+            self.dropped += 1
+            return
+        self._arm()
+
+    def poll(self):
+        """定时轮询：序号未变时什么也不做（不算作重复通知）。"""
+        if self._pending:
+            return
+        if self.backend.sequence() != self._last_seq:
+            self._arm()
+
+    def own_write(self, write):
+        """执行本程序自己的剪贴板写入（如粘贴时），并把由此产生的序号标记为已处理。
+
+        写入后序号同步前进（Win32 序号、Qt 后端的 dataChanged 都是在 setText 内
+        同步发生的），随后到达的通知会因序号未变而被丢弃，不再读取、判重、保存。
+        """
+        write()
+        seq = self.backend.sequence()
+        if seq != self._last_seq:
+            self._last_seq = seq
+            self.suppressed += 1
+
+    def _arm(self):
+        self._pending = True
+        if self.schedule is None:
+            self._flush()
+        else:
+            self.schedule(self.window_ms, self._flush)
+
+    def _flush(self):
+        """合并窗口结束：读取一次剪贴板并交给 handler。"""
+        self._pending = False
+        seq = self.backend.sequence()
+        if seq == self._last_seq:
+            return
+        self._last_seq = seq
+        text = None if self.defer_read else self.backend.read_text()
+        self.processed += 1
+        self.handler(text, seq)
+
+
+class CaptureWorker:
+    """后台捕获线程：依次处理 submit() 进来的剪贴板变化。
+
+    prepare(text, seq) 在后台线程里完成所有与内容大小相关的工作，返回要交给界面
+    的最小增量（元组），返回 None 表示忽略；deliver(*result) 也在后台线程调用，
+    由调用方负责转交界面线程（主程序用跨线程信号）。
+    """
+
+    def __init__(self, backend, prepare, deliver, lazy_threshold=None):
+        self.backend = backend
+        self.prepare = prepare
+        self.deliver = deliver
+        # 设置后由后台线程按大小读取，超过该字符数的内容以 LargeClipboardText 交给 prepare
+        self.lazy_threshold = lazy_threshold
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, text, seq):
+        """登记一次变化；text 为 None 时由后台线程读取剪贴板。"""
+        self._queue.put((text, seq))
+
+    def _run(self):
+        while True:
+            text, seq = self._queue.get()
+            if seq is None:
+                return
+            try:
+                if text is None:
+                    # 读取的总是剪贴板当前内容：已有更新的变化排在后面时跳过这一次
+                    if self.backend.sequence() != seq:
+                        continue
+                    if self.lazy_threshold is None:
+                        text = self.backend.read_text()
+                    else:
+                        text = self.backend.read_capture(self.lazy_threshold)
+                result = self.prepare(text, seq)
+                if result is not None:
+                    self.deliver(*result)
+            except Exception as e:
+                print(f"处理剪贴板内容时出错: {e}")
+
+    def stop(self):
+        """处理完已登记的变化后结束线程。"""
+        self._queue.put((None, None))
@@ -226,6 +226,14 @@ class D1Storage:
                 self._worker = threading.Thread(target=self._drain, daemon=True)
                 self._worker.start()
 
+    def wait_idle(self, timeout=None):
+        """等待后台同步线程把最新快照推送完（退出前调用）；返回是否已完成。"""
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            worker.join(timeout)
+            return not worker.is_alive()
+        return True
+
     def _drain(self):
         """工作线程：不断取出最新快照保存，直到没有待保存数据。"""
         while True:
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""剪贴板历史的有序索引。
+
+原先 clipboard_history 是普通 list：判重用 `text in list`，再 index()/pop()/insert(0)，
+每一步都是线性扫描 + 整串比较，所以历史只能限制在 30 条。
+
+HistoryIndex 以内容哈希为键、用 OrderedDict 保存顺序（第 0 行为最新）：
+- 判重（__contains__）与移到最前（touch）都是 O(1)，不做任何整串比较；
+- 超出上限时从末尾淘汰，同样是 O(1)；
+- 同时保留 list 风格的接口（下标、pop、insert、remove、index），主程序按行号
+  访问的旧代码无需改写。按行号访问依赖一个惰性重建的行号缓存，只有在结构变化
+  后第一次按行访问时才重建一次（仅复制键的引用）。
+
+条目可以是 str，也可以是外置大内容的 BlobRef（见 blob_store.py），后者自带内容
+哈希，两者用 entry_key() 得到相同的键。
+"""
+
+import hashlib
+from collections import OrderedDict
+
+
+# 历史记录默认上限（可在配置文件中用 history_max_items 覆盖）
+HISTORY_MAX_ITEMS = 1000
+
+
+def content_key(text):
+    """内容哈希：同样的文本得到同样的键。"""
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+def entry_key(entry):
+    """条目的键：BlobRef 直接用其内容哈希，str 现算。"""
+    key = getattr(entry, 'key', None)
+    return key if key is not None else content_key(entry)
+
+
+class HistoryIndex:
+    """以内容哈希为键的有序历史记录，第 0 项为最新复制的内容。"""
+
+    def __init__(self, texts=(), max_items=HISTORY_MAX_ITEMS):
+        self.max_items = max_items
+        self._entries = OrderedDict()   # key -> text，按显示顺序排列
+        self._rows = None               # 行号 -> key 的缓存，结构变化后置 None
+        self._pos = None                # key -> 行号 的缓存
+        for text in texts:
+            key = entry_key(text)
+            if key not in self._entries:
+                self._entries[key] = text
+        self.trim()
+
+    # ---------- 内部：行号缓存 ----------
+    def _invalidate(self):
+        self._rows = None
+        self._pos = None
+
+    def _row_keys(self):
+        if self._rows is None:
+            self._rows = list(self._entries)
+        return self._rows
+
+    def _normalize_row(self, row):
+        n = len(self._entries)
+        if row < 0:
+            row += n
+        if not 0 <= row < n:
+            raise IndexError("history index out of range")
+        return row
+
+    # ---------- 查询 ----------
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def __contains__(self, text):
+        try:
+            return entry_key(text) in self._entries
+        except AttributeError:
+            return False
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._entries[k] for k in self._row_keys()[row]]
+        return self._entries[self._row_keys()[self._normalize_row(row)]]
+
+    def index(self, text):
+        """返回 text 所在行号，不存在时抛 ValueError（与 list.index 一致）。"""
+        key = entry_key(text)
+        if key not in self._entries:
+            raise ValueError("text not in history")
+        if self._pos is None:
+            self._pos = {k: i for i, k in enumerate(self._row_keys())}
+        return self._pos[key]
+
+    def has_key(self, key):
+        """按内容哈希判断条目是否存在。"""
+        return key in self._entries
+
+    def row_of_key(self, key):
+        """按内容哈希查行号，不存在时返回 None。"""
+        if key not in self._entries:
+            return None
+        if self._pos is None:
+            self._pos = {k: i for i, k in enumerate(self._row_keys())}
+        return self._pos[key]
+
+    def items(self):
+        """按显示顺序返回 (内容哈希, 条目) 列表。"""
+        return list(self._entries.items())
+
+    def to_list(self):
+        """按显示顺序返回普通 list，用于序列化。"""
+        return list(self._entries.values())
+
+    # ---------- 修改 ----------
+    def touch(self, text, key=None):
+        """把 text 放到最前（已存在则移动，不存在则新增）。
+
+        key 为预先算好的内容哈希（捕获线程已算过时传入，省去再算一遍）。
+        返回它原来的行号；新增时返回 None。
+        """
+        key = key or entry_key(text)
+        old_row = None
+        if key in self._entries:
+            if next(iter(self._entries)) == key:
+                return 0
+            old_row = self.row_of_key(key)
+            self._entries.move_to_end(key, last=False)
+        else:
+            self._entries[key] = text
+            self._entries.move_to_end(key, last=False)
+        self._invalidate()
+        return old_row
+
+    def touch_key(self, key):
+        """把已存在的条目按内容哈希移到最前；不存在时返回 False。"""
+        if key not in self._entries:
+            return False
+        self._entries.move_to_end(key, last=False)
+        self._invalidate()
+        return True
+
+    def discard_key(self, key):
+        """按内容哈希删除条目（不存在时忽略）。"""
+        if self._entries.pop(key, None) is not None:
+            self._invalidate()
+
+    def trim(self):
+        """从末尾淘汰超出上限的条目，返回被淘汰条目的内容哈希列表。"""
+        removed = []
+        while self.max_items and len(self._entries) > self.max_items:
+            key, _ = self._entries.popitem(last=True)
+            if self._rows is not None:
+                self._rows.pop()
+            if self._pos is not None:
+                self._pos.pop(key, None)
+            removed.append(key)
+        return removed
+
+    def insert(self, row, text):
+        """在指定行插入；已存在的相同内容会被移到该位置。"""
+        if row == 0:
+            self.touch(text)
+            return
+        key = entry_key(text)
+        keys = [k for k in self._row_keys() if k != key]
+        keys.insert(row, key)
+        entries = self._entries
+        entries[key] = text
+        self._entries = OrderedDict((k, entries[k]) for k in keys)
+        self._invalidate()
+
+    def append(self, text):
+        key = entry_key(text)
+        self._entries[key] = text
+        self._entries.move_to_end(key, last=True)
+        self._invalidate()
+
+    def pop(self, row=-1):
+        row = self._normalize_row(row)
+        if row == len(self._entries) - 1:
+            key, text = self._entries.popitem(last=True)
+        elif row == 0:
+            key, text = self._entries.popitem(last=False)
+        else:
+            key = self._row_keys()[row]
+            text = self._entries.pop(key)
+        self._invalidate()
+        return text
+
+    def remove(self, text):
+        key = entry_key(text)
+        if key not in self._entries:
+            raise ValueError("text not in history")
+        del self._entries[key]
+        self._invalidate()
+
+    def __setitem__(self, row, text):
+        """编辑第 row 行的内容（保持所在位置）。"""
+        row = self._normalize_row(row)
+        old_key = self._row_keys()[row]
+        new_key = entry_key(text)
+        if new_key == old_key:
+            self._entries[old_key] = text
+            return
+        items = [(new_key, text) if k == old_key else (k, self._entries[k])
+                 for k in self._row_keys() if k != new_key]
+        self._entries = OrderedDict(items)
+        self._invalidate()
+
+    def clear(self):
+        self._entries.clear()
+        self._invalidate()
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""剪贴板历史的本地持久化。
+
+原先每次复制、删除、编辑、粘贴都会用 indent=2 整体重写 .clipboard_history.json，
+写入量随历史总量增长，且写到一半崩溃会丢掉整个文件。
+
+JournalHistoryStore 改为「快照 + 追加日志」：
+- 快照仍是 .clipboard_history.json（普通 JSON 数组，兼容旧版本文件）；
+- 每次改动只向 .clipboard_history.json.journal 追加一行 JSON（一次很小的写入）；
+- 日志累积到一定量后，在后台线程把当前历史写成新快照：先写临时文件再 os.replace
+  原子替换，写完才删除旧日志，任何时刻崩溃都能从「快照 + 日志」完整恢复；
+- load() 读取快照后按顺序重放日志。
+
+两种存储的 record_* 都只把改动排进内存队列，再调用 on_dirty（主程序把它接到
+WriteBehindPersister，见 write_behind.py），由后台线程调用 flush() 成批写盘；
+未设置 on_dirty 时立即 flush()。
+
+SQLiteHistoryStore 是可选的存储引擎（配置 history_engine = "sqlite"）：全部历史
+永久保存在 .clipboard_history.db，内存里只保留最近 history_max_items 条用于显示；
+带 FTS5 trigram 全文索引，搜索历史时直接查索引，不必扫描 Python 列表。
+两种存储提供相同的接口（load / record_* / compact / search / close），
+主程序的 load_history / save_history / search_items 无需关心具体引擎。
+
+日志条目（每行一个 JSON 对象）：
+    {"op": "add",   "text": ...}          新内容放到最前
+    {"op": "top",   "k": key}             已有内容移到最前（只记哈希，不重复写全文）
+    {"op": "del",   "k": key}             删除
+    {"op": "edit",  "k": key, "text": ...} 原地修改内容
+    {"op": "clear"}                        清空
+外置的大内容（BlobRef）在快照和日志里都以 {"blob": 哈希, "size": ..., "preview": ...}
+代替全文，add / edit 条目相应地用 "blob" 字段代替 "text"。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from history_index import HistoryIndex, entry_key
+from blob_store import BlobRef, entry_to_json, entry_from_json
+
+
+class JournalHistoryStore:
+    """快照 + 追加日志的历史记录存储。"""
+
+    def __init__(self, snapshot_path, compact_ops=500, compact_bytes=8 * 1024 * 1024):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + '.journal'
+        # 压缩期间被换下的旧日志：快照写完后才删除，崩溃时 load() 仍会重放它
+        self.rotated_path = self.journal_path + '.old'
+        self.compact_ops = compact_ops
+        self.compact_bytes = compact_bytes
+
+        self.history = None          # load() 返回的 HistoryIndex，压缩时从这里取快照
+        self.on_dirty = None         # 有待写日志时的回调（通常接到后台合并写入）
+        self._lock = threading.RLock()
+        self._pending = []           # 尚未写盘的日志行
+        self._fh = None              # 日志追加句柄
+        self._ops = 0                # 上次压缩以来追加的条数
+        self._bytes = 0
+        self._compactor = None       # 后台压缩线程
+
+    # ---------- 读取 ----------
+    def load(self, max_items):
+        """读取快照并重放日志，返回 HistoryIndex。"""
+        texts = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                texts = [entry_from_json(e) for e in json.load(f)]
+        history = HistoryIndex(texts, max_items=max_items)
+
+        had_rotated = os.path.exists(self.rotated_path)
+        for path in (self.rotated_path, self.journal_path):
+            self._replay(history, path)
+
+        self.history = history
+        if had_rotated:
+            # 上次压缩中途退出：立即写出完整快照，再清理两份日志
+            self._write_snapshot(history.to_list())
+            self._remove(self.rotated_path)
+            self._remove(self.journal_path)
+            self._ops = self._bytes = 0
+        return history
+
+    def _replay(self, history, path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    # 最后一行可能因崩溃只写了一半，跳过即可
+                    continue
+                self._apply(history, op)
+                self._ops += 1
+                self._bytes += len(line)
+
+    @staticmethod
+    def _op_entry(op):
+        return op["text"] if "text" in op else BlobRef.from_json(op["blob"])
+
+    @staticmethod
+    def _with_entry(op, entry):
+        if isinstance(entry, BlobRef):
+            op["blob"] = entry.to_json()
+        else:
+            op["text"] = entry
+        return op
+
+    @classmethod
+    def _apply(cls, history, op):
+        kind = op.get("op")
+        if kind == "add":
+            history.touch(cls._op_entry(op))
+            history.trim()
+        elif kind == "top":
+            history.touch_key(op["k"])
+        elif kind == "del":
+            history.discard_key(op["k"])
+        elif kind == "edit":
+            row = history.row_of_key(op["k"])
+            if row is not None:
+                history[row] = cls._op_entry(op)
+        elif kind == "clear":
+            history.clear()
+
+    # ---------- 追加日志 ----------
+    def record_touch(self, text, existed, key=None):
+        """记录「放到最前」：已有内容只记哈希，新内容记全文。"""
+        if existed:
+            self._append({"op": "top", "k": key or entry_key(text)})
+        else:
+            self._append(self._with_entry({"op": "add"}, text))
+
+    def record_delete(self, text):
+        self._append({"op": "del", "k": entry_key(text)})
+
+    def record_edit(self, old_text, new_text):
+        self._append(self._with_entry({"op": "edit", "k": entry_key(old_text)}, new_text))
+
+    def record_clear(self):
+        self._append({"op": "clear"})
+
+    def _append(self, op):
+        line = json.dumps(op, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._pending.append(line)
+            self._ops += 1
+            self._bytes += len(line)
+        if self.on_dirty is not None:
+            self.on_dirty()
+        else:
+            self.flush()
+        if self._ops >= self.compact_ops or self._bytes >= self.compact_bytes:
+            self.compact()
+
+    def flush(self):
+        """把排队的日志行一次性写入日志文件（可在后台线程调用）。"""
+        with self._lock:
+            if not self._pending:
+                return
+            lines, self._pending = self._pending, []
+            try:
+                if self._fh is None:
+                    self._fh = open(self.journal_path, 'a', encoding='utf-8')
+                self._fh.write(''.join(lines))
+                self._fh.flush()
+            except Exception as e:
+                print(f"追加历史日志时出错: {e}")
+
+    # ---------- 压缩 ----------
+    def compact(self, wait=False):
+        """把当前历史写成新快照并清空日志。
+
+        在调用线程（主线程）取快照并换下旧日志，真正的序列化与写盘放在后台线程。
+        上一次压缩仍在进行时直接跳过，日志会在下次达到阈值时再压缩。
+        """
+        if self.history is None:
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            if wait:
+                self._compactor.join()
+            else:
+                return
+        with self._lock:
+            self._compact_locked(wait)
+
+    def _compact_locked(self, wait):
+        snapshot = self.history.to_list()
+        self.close()
+        if os.path.exists(self.rotated_path):
+            # 上次快照写入失败、旧日志仍在：不能再轮换（会覆盖它），改为同步写快照后一并清理
+            if self._write_snapshot(snapshot):
+                self._remove(self.rotated_path)
+                self._remove(self.journal_path)
+                self._ops = self._bytes = 0
+            return
+        try:
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.rotated_path)
+        except Exception as e:
+            print(f"轮换历史日志时出错: {e}")
+            return
+        self._ops = self._bytes = 0
+        self._compactor = threading.Thread(target=self._compact_worker, args=(snapshot,), daemon=True)
+        self._compactor.start()
+        if wait:
+            self._compactor.join()
+
+    def _compact_worker(self, snapshot):
+        if self._write_snapshot(snapshot):
+            self._remove(self.rotated_path)
+
+    def _write_snapshot(self, texts):
+        """先写临时文件再原子替换，写入失败不会破坏原快照。"""
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump([entry_to_json(e) for e in texts], f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            return True
+        except Exception as e:
+            print(f"写入历史快照时出错: {e}")
+            return False
+
+    @staticmethod
+    def _remove(path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"删除历史日志 {path} 时出错: {e}")
+
+    def blob_keys(self):
+        """仍被历史记录引用的外置内容哈希。"""
+        return {e.key for e in (self.history or ()) if isinstance(e, BlobRef)}
+
+    def search(self, pattern, case_sensitive=False):
+        """日志存储没有索引，返回 None 表示由调用方自行扫描内存中的历史。"""
+        return None
+
+    def close(self):
+        """写出排队的日志并关闭句柄（退出前调用；之后再追加会自动重新打开）。"""
+        with self._lock:
+            self.flush()
+            if self._fh is not None:
+                try:
+                    self._fh.close()
+                except Exception:
+                    pass
+                self._fh = None
+
+
+class SQLiteHistoryStore:
+    """SQLite 历史记录存储：全部历史永久保留，FTS5 trigram 索引支持子串搜索。
+
+    clips 表按 seq 排序（越大越新）；clips_fts 是外部内容表，由触发器与 clips
+    保持同步。trigram 分词需要 SQLite 3.34+，不可用时 search() 返回 None，
+    调用方退回到扫描内存中的历史。外置的大内容只有预览进入全文索引。
+    """
+
+    def __init__(self, db_path, legacy_snapshot_path=None):
+        self.db_path = db_path
+        self.legacy_snapshot_path = legacy_snapshot_path
+        self.history = None
+        self.has_fts = False
+        self.on_dirty = None
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._pending = []           # 排队中的写库操作
+        # 写库在后台合并写入线程中执行，连接需允许跨线程使用（由 _lock 串行化）
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        c = self.conn
+        c.execute("""CREATE TABLE IF NOT EXISTS clips (
+                         id INTEGER PRIMARY KEY,
+                         key TEXT NOT NULL UNIQUE,
+                         text TEXT NOT NULL,
+                         seq INTEGER NOT NULL)""")
+        # 外置大内容：blob 为内容哈希，text 列只存预览
+        columns = {r[1] for r in c.execute("PRAGMA table_info(clips)")}
+        if "blob" not in columns:
+            c.execute("ALTER TABLE clips ADD COLUMN blob TEXT")
+            c.execute("ALTER TABLE clips ADD COLUMN size INTEGER")
+        c.execute("CREATE INDEX IF NOT EXISTS clips_seq ON clips(seq)")
+        try:
+            c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS clips_fts USING fts5(
+                             text, content='clips', content_rowid='id', tokenize='trigram')""")
+            c.executescript("""
+                CREATE TRIGGER IF NOT EXISTS clips_ai AFTER INSERT ON clips BEGIN
+                    INSERT INTO clips_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS clips_ad AFTER DELETE ON clips BEGIN
+                    INSERT INTO clips_fts(clips_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS clips_au AFTER UPDATE OF text ON clips BEGIN
+                    INSERT INTO clips_fts(clips_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO clips_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+            """)
+            self.has_fts = True
+        except sqlite3.Error as e:
+            print(f"当前 SQLite 不支持 FTS5 trigram，历史搜索将扫描内存: {e}")
+        c.commit()
+
+    # ---------- 读取 ----------
+    def load(self, max_items):
+        """返回最近 max_items 条历史；首次使用时导入旧的 JSON 快照与日志。"""
+        row = self.conn.execute("SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM clips").fetchone()
+        if row[0] == 0 and self.legacy_snapshot_path and os.path.exists(self.legacy_snapshot_path):
+            self._import_legacy()
+            row = self.conn.execute("SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM clips").fetchone()
+        self._seq = row[1]
+
+        sql = "SELECT text, blob, size FROM clips ORDER BY seq DESC"
+        if max_items:
+            sql += f" LIMIT {int(max_items)}"
+        texts = [BlobRef(blob, size, text) if blob else text
+                 for text, blob, size in self.conn.execute(sql)]
+        self.history = HistoryIndex(texts, max_items=max_items)
+        return self.history
+
+    def _import_legacy(self):
+        legacy = JournalHistoryStore(self.legacy_snapshot_path).load(0)
+        texts = legacy.to_list()
+        n = len(texts)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO clips(key, text, blob, size, seq) VALUES (?, ?, ?, ?, ?)",
+                (self._columns(t) + (n - i,) for i, t in enumerate(texts)))
+        print(f"已把 {n} 条历史记录导入 SQLite")
+
+    # ---------- 写入 ----------
+    @staticmethod
+    def _columns(entry, key=None):
+        """条目 -> (key, text, blob, size)；外置内容的 text 列只存预览。"""
+        if isinstance(entry, BlobRef):
+            return entry.key, entry.preview, entry.key, entry.size
+        return key or entry_key(entry), entry, None, None
+
+    def _next_seq(self):
+        self._seq += 1
+        return self._seq
+
+    def _queue(self, job):
+        """把一次写库操作排进队列；flush() 时在同一个事务里执行。"""
+        with self._lock:
+            self._pending.append(job)
+        if self.on_dirty is not None:
+            self.on_dirty()
+        else:
+            self.flush()
+
+    def flush(self):
+        """在一个事务里执行排队的写库操作（可在后台线程调用）。"""
+        with self._lock:
+            if not self._pending:
+                return
+            jobs, self._pending = self._pending, []
+            try:
+                with self.conn:
+                    for job in jobs:
+                        job(self.conn)
+            except sqlite3.Error as e:
+                print(f"写入历史数据库时出错: {e}")
+
+    def record_touch(self, text, existed, key=None):
+        columns = self._columns(text, key)
+        seq = self._next_seq()
+
+        def job(conn):
+            if existed and conn.execute("UPDATE clips SET seq=? WHERE key=?", (seq, columns[0])).rowcount:
+                return
+            conn.execute(
+                "INSERT INTO clips(key, text, blob, size, seq) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET seq=excluded.seq",
+                columns + (seq,))
+        self._queue(job)
+
+    def record_delete(self, text):
+        key = entry_key(text)
+        self._queue(lambda conn: conn.execute("DELETE FROM clips WHERE key=?", (key,)))
+
+    def record_edit(self, old_text, new_text):
+        old_key = entry_key(old_text)
+        new_key, text, blob, size = self._columns(new_text)
+        if old_key == new_key:
+            return
+
+        def job(conn):
+            conn.execute("DELETE FROM clips WHERE key=?", (new_key,))
+            conn.execute("UPDATE clips SET key=?, text=?, blob=?, size=? WHERE key=?",
+                         (new_key, text, blob, size, old_key))
+        self._queue(job)
+
+    def record_clear(self):
+        self._queue(lambda conn: conn.execute("DELETE FROM clips"))
+
+    def compact(self, wait=False):
+        """写出排队的改动，再做 WAL 检查点与索引整理。"""
+        self.flush()
+        with self._lock:
+            try:
+                if self.has_fts:
+                    self.conn.execute("INSERT INTO clips_fts(clips_fts) VALUES ('optimize')")
+                self.conn.commit()
+                self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            except sqlite3.Error as e:
+                print(f"整理历史数据库时出错: {e}")
+
+    def blob_keys(self):
+        """数据库（含不在内存中的旧条目）仍引用的外置内容哈希。"""
+        self.flush()
+        with self._lock:
+            return {r[0] for r in self.conn.execute("SELECT blob FROM clips WHERE blob IS NOT NULL")}
+
+    # ---------- 搜索 ----------
+    def search(self, pattern, case_sensitive=False):
+        """普通子串搜索全部历史（含已不在内存中的旧条目），按新到旧返回条目列表。
+
+        3 个字符以上走 trigram 索引，更短的用 LIKE；索引结果再用与 normal_search
+        相同的规则核对一遍（大小写、LIKE 的通配符等）。不支持时返回 None。
+        """
+        if not self.has_fts or not pattern:
+            return None
+        self.flush()
+        with self._lock:
+            hits = self._search_locked(pattern, case_sensitive)
+        return [BlobRef(blob, size, text) if blob else text for text, blob, size in hits]
+
+    def _search_locked(self, pattern, case_sensitive):
+        if len(pattern) >= 3:
+            query = '"' + pattern.replace('"', '""') + '"'
+            rows = self.conn.execute(
+                "SELECT c.text, c.blob, c.size FROM clips_fts JOIN clips c ON c.id = clips_fts.rowid "
+                "WHERE clips_fts MATCH ? ORDER BY c.seq DESC", (query,))
+        else:
+            like = '%' + pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            rows = self.conn.execute(
+                "SELECT text, blob, size FROM clips WHERE text LIKE ? ESCAPE '\\' ORDER BY seq DESC", (like,))
+        if case_sensitive:
+            return [r for r in rows if pattern in r[0]]
+        needle = pattern.lower()
+        return [r for r in rows if needle in r[0].lower()]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            try:
+                self.conn.commit()
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+
+
+def open_history_store(engine, snapshot_path):
+    """按配置创建历史存储：'sqlite' 使用 SQLite，其余使用快照 + 日志。"""
+    if engine == "sqlite":
+        try:
+            db_path = os.path.splitext(snapshot_path)[0] + '.db'
+            return SQLiteHistoryStore(db_path, legacy_snapshot_path=snapshot_path)
+        except Exception as e:
+            print(f"打开 SQLite 历史数据库失败，改用 JSON 日志存储: {e}")
+    return JournalHistoryStore(snapshot_path)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""热键到窗口可见的延迟统计。
+
+按下全局热键后窗口多久才真正画出来，只凭感觉很难比较。LatencyRecorder 记录
+每一次的耗时（毫秒）：
+- 内存里保留最近 keep 个样本，summary() 给出次数、中位数、p95 和最大值；
+- 指定 log_path 时每个样本追加一行到日志文件（时间、标签、毫秒），便于长期
+  对比不同版本、不同设置下的表现。写日志失败只打印，不影响程序。
+"""
+
+import time
+from collections import deque
+
+
+class LatencyRecorder:
+    """保存最近若干次延迟样本，并可追加写入日志文件。"""
+
+    def __init__(self, log_path=None, keep=200):
+        self.log_path = log_path
+        self._samples = deque(maxlen=keep)
+
+    def record(self, label, ms):
+        """记录一次耗时（毫秒）。"""
+        self._samples.append(ms)
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{label}\t{ms:.1f}\n")
+            except Exception as e:
+                print(f"写入延迟日志失败: {e}")
+
+    def summary(self):
+        """返回 (次数, 中位数, p95, 最大值)；没有样本时返回 None。"""
+        if not self._samples:
+            return None
+        data = sorted(self._samples)
+        n = len(data)
+        return n, data[n // 2], data[min(n - 1, int(n * 0.95))], data[-1]
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""子串搜索用的 n-gram 倒排索引。
+
+search_items 原先对每次按键都把全部历史和所有收藏夹的每一条 match_text 一遍。
+NgramIndex 把每段文本（条目内容或收藏描述）拆成 n-gram，记录 gram -> 文本 的
+倒排表：
+- 所有位置的三字符片段（trigram）都进索引；含中文等 CJK 字符的两字符片段
+  （bigram）也进索引，所以两个汉字的查询同样能走索引；
+- 查询拆成同样的片段，各片段倒排表的交集就是候选，调用方只需核对候选；
+- 文本按内容哈希（history_index.content_key）标识，同样的内容只索引一次；
+- 统一按 lower() 建索引，与 normal_search 不区分大小写时的规则一致；区分
+  大小写、全字匹配都是子串匹配的子集，候选同样适用，由调用方核对。
+
+超过 MAX_INDEXED_CHARS 的文本不拆分，记为“总是候选”。索引只是数据的缓存，不写入
+磁盘：启动后由调用方在后台线程按历史与收藏重建，建好后把 ready 置为 True，此前
+搜索应逐条核对。多出的（已删除内容的）文档只会多出几个候选，prune() 时清理；
+缺少的文档由调用方在搜索前用 add() 补上。各方法由内部锁保护，后台线程与界面
+线程可以同时使用。
+"""
+
+import threading
+
+
+# 超过这个字符数的文本不建索引（总是作为候选）
+MAX_INDEXED_CHARS = 64 * 1024
+
+
+def _is_cjk(ch):
+    o = ord(ch)
+    return (0x3040 <= o <= 0x30FF or 0x3400 <= o <= 0x4DBF or 0x4E00 <= o <= 0x9FFF
+            or 0xAC00 <= o <= 0xD7AF or 0xF900 <= o <= 0xFAFF or 0xFF00 <= o <= 0xFFEF)
+
+
+def ngrams(text):
+    """文本 -> gram 集合：全部 trigram，加上含 CJK 字符的 bigram。"""
+    text = text.lower()
+    grams = {text[i:i + 3] for i in range(len(text) - 2)}
+    for i in range(len(text) - 1):
+        pair = text[i:i + 2]
+        if _is_cjk(pair[0]) or _is_cjk(pair[1]):
+            grams.add(pair)
+    return grams
+
+
+class NgramIndex:
+    """内容哈希 -> gram 集合，以及 gram -> 内容哈希集合 的倒排表。"""
+
+    def __init__(self):
+        self._docs = {}       # key -> frozenset(grams)；不建索引的长文本为 None
+        self._postings = {}   # gram -> set(key)
+        self._always = set()  # 不建索引、总是作为候选的 key
+        self._lock = threading.RLock()
+        self.ready = False    # 初次重建完成后为 True，此前 candidates() 的结果不完整
+
+    def __contains__(self, key):
+        return key in self._docs
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, key, text):
+        """索引一段文本（已索引过的 key 直接跳过）。"""
+        if key in self._docs:
+            return
+        grams = None if len(text) > MAX_INDEXED_CHARS else frozenset(ngrams(text))
+        with self._lock:
+            if key in self._docs:
+                return
+            self._docs[key] = grams
+            if grams is None:
+                self._always.add(key)
+                return
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(key)
+
+    def add_unindexed(self, key):
+        """登记一段不拆分的文本（如外置的大内容），它总是候选。"""
+        with self._lock:
+            if key not in self._docs:
+                self._docs[key] = None
+                self._always.add(key)
+
+    def discard(self, key):
+        with self._lock:
+            grams = self._docs.pop(key, None)
+            self._always.discard(key)
+            if grams:
+                for gram in grams:
+                    keys = self._postings.get(gram)
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del self._postings[gram]
+
+    def prune(self, live_keys):
+        """删除不在 live_keys 中的文档，返回删除的个数。"""
+        with self._lock:
+            stale = [key for key in self._docs if key not in live_keys]
+            for key in stale:
+                self.discard(key)
+        return len(stale)
+
+    def candidates(self, pattern):
+        """可能包含 pattern 的文档 key 集合；pattern 太短、无法用索引时返回 None。"""
+        grams = ngrams(pattern)
+        if not grams:
+            return None
+        with self._lock:
+            result = None
+            # 从最短的倒排表开始求交集
+            for gram in sorted(grams, key=lambda g: len(self._postings.get(g, ()))):
+                keys = self._postings.get(gram)
+                if not keys:
+                    result = set()
+                    break
+                result = set(keys) if result is None else result & keys
+                if not result:
+                    break
+            return result | self._always
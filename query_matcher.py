@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""搜索匹配：条目的规整形式缓存 + 只编译一次的查询。
+
+match_text / normal_search 原先对每个条目都重新做一遍同样的准备：re.search 每次
+按字符串查正则缓存，不区分大小写时每条都 lower() 一遍，全字匹配时每条都用
+re.findall 把整段文本重新分词。
+
+- NormalizedText：一段文本的 lower() 形式与词集合，都在第一次用到时才生成，
+  之后同一段内容的所有查询共用；
+- NormalizedCache：按内容哈希缓存 NormalizedText（有上限的 LRU）。内容被编辑后
+  哈希随之改变，所以每段内容只规整一次，旧的形式自然被淘汰；
+- QueryMatcher：一次查询只构造一次——正则在这里编译，普通搜索的关键词在这里
+  lower()——之后每个条目只剩一次子串查找、集合查找或正则 search。
+
+匹配规则与原先的 normal_search 一致：不区分大小写用 lower()，全字匹配按
+\\b\\w+\\b 分词后整词比较；正则写错时按普通文本搜索。
+
+FuzzyMatcher 是搜索对话框的“模糊排序”模式：关键词按子序列匹配（fzf 风格），
+命中词首、连续命中加分，空隙扣分，描述的得分乘以可配置的权重；由调用方用有
+上限的堆只保留得分最高的若干条。
+
+命中位置（QueryMatcher.find、FuzzyMatcher.match 给出的 span）在搜索线程中算好，
+随结果一起交给界面，显示片段时不必再扫描整段内容。
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+
+WORD_RE = re.compile(r'\b\w+\b')
+
+# 超过这个字符数的文本不缓存规整形式（每次现算，避免缓存占用过多内存）
+MAX_CACHED_CHARS = 64 * 1024
+
+
+class NormalizedText:
+    """一段文本及其按需生成的 lower() 形式、词集合。"""
+
+    __slots__ = ("text", "_lower", "_words", "_lower_words")
+
+    def __init__(self, text):
+        self.text = text
+        self._lower = None
+        self._words = None
+        self._lower_words = None
+
+    @property
+    def lower(self):
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def words(self):
+        """原文中的词集合（区分大小写的全字匹配）。"""
+        if self._words is None:
+            self._words = frozenset(WORD_RE.findall(self.text))
+        return self._words
+
+    @property
+    def lower_words(self):
+        """lower() 后的词集合（不区分大小写的全字匹配）。"""
+        if self._lower_words is None:
+            self._lower_words = frozenset(WORD_RE.findall(self.lower))
+        return self._lower_words
+
+
+class NormalizedCache:
+    """内容哈希 -> NormalizedText 的 LRU 缓存。"""
+
+    def __init__(self, max_items=5000):
+        self.max_items = max_items
+        self._forms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, text):
+        """返回 text 的规整形式；key 为其内容哈希（None 或文本过长时不缓存）。"""
+        if key is None or len(text) > MAX_CACHED_CHARS:
+            return NormalizedText(text)
+        with self._lock:
+            form = self._forms.get(key)
+            if form is not None:
+                self._forms.move_to_end(key)
+                return form
+            form = NormalizedText(text)
+            self._forms[key] = form
+            if len(self._forms) > self.max_items:
+                self._forms.popitem(last=False)
+            return form
+
+    def clear(self):
+        with self._lock:
+            self._forms.clear()
+
+
+class QueryMatcher:
+    """编译好的一次查询，matches() 判断一段规整文本是否命中。"""
+
+    def __init__(self, pattern, use_regex=False, case_sensitive=False, whole_word=False):
+        self.case_sensitive = case_sensitive
+        self.whole_word = whole_word
+        self.regex = None
+        if use_regex:
+            try:
+                self.regex = re.compile(r'\b' + pattern + r'\b' if whole_word else pattern,
+                                        0 if case_sensitive else re.IGNORECASE)
+            except re.error:
+                pass  # 正则表达式错误，按普通文本搜索
+        self.needle = pattern if case_sensitive else pattern.lower()
+        self._finder = None   # find() 用的正则，第一次调用时编译
+
+    def matches(self, form):
+        if self.regex is not None:
+            return self.regex.search(form.text) is not None
+        if self.whole_word:
+            return self.needle in (form.words if self.case_sensitive else form.lower_words)
+        return self.needle in (form.text if self.case_sensitive else form.lower)
+
+    def matches_any(self, *forms):
+        return any(self.matches(form) for form in forms)
+
+    def find(self, text):
+        """第一个命中位置 (start, end)，用于显示命中附近的片段；找不到时返回 None。
+
+        普通搜索在第一次调用时编译成等价的正则，查找时不必复制、lower() 整段文本。
+        """
+        finder = self.regex
+        if finder is None:
+            if self._finder is None:
+                pattern = re.escape(self.needle)
+                if self.whole_word:
+                    pattern = r'\b' + pattern + r'\b'
+                self._finder = re.compile(pattern, 0 if self.case_sensitive else re.IGNORECASE)
+            finder = self._finder
+        match = finder.search(text)
+        return match.span() if match else None
+
+
+# ---------- 模糊排序（fzf 风格） ----------
+SCORE_MATCH = 16          # 每个命中字符的基础分
+BONUS_BOUNDARY = 8        # 命中词首（行首、空白或标点之后）
+BONUS_CAMEL = 7           # 命中驼峰的大写字母
+BONUS_CONSECUTIVE = 4     # 连续命中
+PENALTY_GAP_START = -3    # 命中字符之间出现空隙
+PENALTY_GAP_EXTENSION = -1
+# 只在开头这么多字符内做模糊匹配，超大条目的打分耗时有上限
+FUZZY_MAX_CHARS = 10000
+
+
+def _boundary_bonus(prev, ch):
+    if prev is None or not prev.isalnum():
+        return BONUS_BOUNDARY
+    if prev.islower() and ch.isupper():
+        return BONUS_CAMEL
+    return 0
+
+
+def fuzzy_score(needle, haystack, original=None):
+    """needle 作为子序列出现在 haystack 中时返回得分（越高越好），否则返回 None。"""
+    match = fuzzy_match(needle, haystack, original)
+    return match[0] if match is not None else None
+
+
+def fuzzy_match(needle, haystack, original=None):
+    """needle 作为子序列出现在 haystack 中时返回 (得分, (起点, 终点))，否则返回 None。
+
+    先向前找到最早能匹配完的位置，再从那里向后找最紧凑的起点（同 fzf v1），
+    然后按词首、连续命中加分，空隙扣分。original 为未 lower() 的原文，用来
+    识别驼峰（不给时按 haystack 判断）。
+    """
+    n = len(needle)
+    if n == 0:
+        return 0, None
+    original = haystack if original is None else original
+    i = 0
+    end = -1
+    for j, ch in enumerate(haystack):
+        if ch == needle[i]:
+            i += 1
+            if i == n:
+                end = j
+                break
+    if end < 0:
+        return None
+    i = n - 1
+    start = end
+    for j in range(end, -1, -1):
+        if haystack[j] == needle[i]:
+            i -= 1
+            if i < 0:
+                start = j
+                break
+
+    score = 0
+    k = 0
+    consecutive = False
+    in_gap = False
+    first_bonus = 0
+    prev = original[start - 1] if start > 0 else None
+    for j in range(start, end + 1):
+        ch = original[j]
+        if k < n and haystack[j] == needle[k]:
+            bonus = _boundary_bonus(prev, ch)
+            if consecutive:
+                bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+            else:
+                first_bonus = bonus
+            if k == 0:
+                bonus *= 2
+            score += SCORE_MATCH + bonus
+            consecutive = True
+            in_gap = False
+            k += 1
+        else:
+            score += PENALTY_GAP_EXTENSION if in_gap else PENALTY_GAP_START
+            consecutive = False
+            in_gap = True
+        prev = ch
+    return score, (start, end + 1)
+
+
+class FuzzyMatcher:
+    """模糊排序的一次查询：内容与描述分别打分，描述得分乘以 description_weight。"""
+
+    def __init__(self, pattern, case_sensitive=False, description_weight=0.5):
+        self.case_sensitive = case_sensitive
+        self.needle = pattern if case_sensitive else pattern.lower()
+        self.description_weight = description_weight
+
+    def _match(self, form):
+        text = form.text[:FUZZY_MAX_CHARS]
+        if self.case_sensitive:
+            return fuzzy_match(self.needle, text)
+        # 只 lower() 参与匹配的开头部分；短文本直接用已缓存的 lower() 形式
+        lowered = form.lower if len(form.text) <= FUZZY_MAX_CHARS else text.lower()
+        if len(lowered) == len(text):
+            return fuzzy_match(self.needle, lowered, text)
+        # 个别字符 lower() 后长度会变，此时无法与原文逐字对应：不识别驼峰，也不给命中位置
+        match = fuzzy_match(self.needle, lowered)
+        return None if match is None else (match[0], None)
+
+    def match(self, form, description_form=None):
+        """返回 (最高得分, 内容中的命中位置)，都不匹配时返回 None。
+
+        命中位置为内容里第一处命中的 (起点, 终点)；只有描述命中时为 None。
+        """
+        content = self._match(form)
+        best, span = content if content is not None else (None, None)
+        if description_form is not None and self.description_weight > 0:
+            desc = self._match(description_form)
+            if desc is not None:
+                score = desc[0] * self.description_weight
+                best = score if best is None else max(best, score)
+        return None if best is None else (best, span)
+
+    def score(self, form, description_form=None):
+        """返回最高得分，都不匹配时返回 None。"""
+        match = self.match(form, description_form)
+        return match[0] if match is not None else None
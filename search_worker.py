@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""搜索对话框的后台搜索线程。
+
+原先每按一次键，搜索对话框都在界面线程同步执行 search_items 并重填结果列表，
+内容多或正则慢时输入框会卡住。SearchWorker 把搜索放到一个后台线程：
+- 每次 submit() 的查询得到一个递增的代号（generation）；新查询到来时旧查询
+  立即作废：还没开始的直接丢弃，正在执行的在下一次检查 cancelled() 时退出；
+- 结果分批交付：攒够 batch_size 条或距上次交付超过 batch_ms 毫秒就交一批，
+  列表边搜边显示；
+- deliver(generation, batch, done) / fail(generation, error) 在后台线程调用，
+  由调用方转交界面线程（主程序用跨线程信号），并按代号丢弃过期的批次。
+
+仅使用标准库。
+"""
+
+import time
+import threading
+
+
+class SearchWorker:
+    """单线程后台搜索，只执行最新的查询。"""
+
+    def __init__(self, deliver, fail, batch_size=50, batch_ms=50):
+        self.deliver = deliver
+        self.fail = fail
+        self.batch_size = batch_size
+        self.batch_time = batch_ms / 1000.0
+        self.generation = 0
+        self._cond = threading.Condition()
+        self._job = None          # (generation, search)，只保留最新的一个
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, search):
+        """登记一次查询并返回它的代号。
+
+        search(cancelled) 返回结果的可迭代对象，应在耗时的循环中检查 cancelled()。
+        """
+        with self._cond:
+            self.generation += 1
+            self._job = (self.generation, search)
+            self._cond.notify()
+            return self.generation
+
+    def cancel(self):
+        """作废当前查询（不再交付它的结果）。"""
+        with self._cond:
+            self.generation += 1
+            self._job = None
+
+    def stop(self):
+        with self._cond:
+            self.generation += 1
+            self._job = None
+            self._stopped = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._job is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                generation, search = self._job
+                self._job = None
+
+            def cancelled():
+                return self.generation != generation
+
+            try:
+                batch = []
+                last = time.monotonic()
+                for result in search(cancelled):
+                    if cancelled():
+                        break
+                    batch.append(result)
+                    now = time.monotonic()
+                    if len(batch) >= self.batch_size or now - last >= self.batch_time:
+                        self.deliver(generation, batch, False)
+                        batch = []
+                        last = now
+                if not cancelled():
+                    self.deliver(generation, batch, True)
+            except Exception as e:
+                if not cancelled():
+                    self.fail(generation, e)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""CapturePipeline 的计数与自身写入跳过，用 FakeClipboardBackend 在无界面环境下验证。"""
+
+from clipboard_watch import CapturePipeline, FakeClipboardBackend
+
+
+def make_pipeline(schedule=None):
+    backend = FakeClipboardBackend("初始内容")
+    handled = []
+    pipeline = CapturePipeline(backend, lambda text, seq: handled.append((text, seq)),
+                               schedule=schedule)
+    return backend, pipeline, handled
+
+
+def test_each_sequence_processed_once():
+    backend, pipeline, handled = make_pipeline()
+    backend.set_text("a")
+    pipeline.notify()
+    pipeline.notify()   # 同一序号的重复通知
+    pipeline.poll()     # 轮询到序号未变：不处理，也不算重复
+    assert handled == [("a", 1)]
+    assert pipeline.processed == 1
+    assert pipeline.dropped == 1
+    assert backend.reads == 1
+
+
+def test_notifications_within_window_are_coalesced():
+    pending = []
+    backend, pipeline, handled = make_pipeline(schedule=lambda ms, fn: pending.append(fn))
+    backend.set_text("a")
+    pipeline.notify()
+    backend.set_text("b")
+    pipeline.notify()   # 合并窗口内的后续通知被丢弃
+    pipeline.poll()
+    assert handled == [] and len(pending) == 1
+    pending.pop()()
+    assert handled == [("b", 2)]
+    assert pipeline.processed == 1
+    assert pipeline.dropped == 1
+    assert backend.reads == 1
+
+
+def test_own_write_is_suppressed():
+    backend, pipeline, handled = make_pipeline()
+    pipeline.own_write(lambda: backend.set_text("pasted"))
+    pipeline.notify()   # 自身写入随后到达的通知
+    pipeline.poll()
+    assert handled == []
+    assert pipeline.suppressed == 1
+    assert pipeline.processed == 0
+    assert pipeline.dropped == 1
+    assert backend.reads == 0
+
+    # 之后的外部复制照常处理
+    backend.set_text("external")
+    pipeline.poll()
+    assert handled == [("external", 2)]
+    assert pipeline.processed == 1
+
+
+def test_own_write_without_change_is_not_counted():
+    backend, pipeline, handled = make_pipeline()
+    pipeline.own_write(lambda: None)
+    assert pipeline.suppressed == 0
+    assert handled == []
+
+
+def test_deferred_read_leaves_reading_to_worker():
+    backend = FakeClipboardBackend()
+    handled = []
+    pipeline = CapturePipeline(backend, lambda text, seq: handled.append((text, seq)),
+                               defer_read=True)
+    backend.set_text("a")
+    pipeline.poll()
+    assert handled == [(None, 1)]
+    assert backend.reads == 0
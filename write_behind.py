@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""后台合并写入（write-behind）。
+
+原先 save_history / save_favorites 在几乎每个操作后都在 GUI 线程同步执行，连
+Alt+↑/↓ 调整收藏顺序时每按一次键都要整包保存一次收藏夹。
+
+WriteBehindPersister 把这些保存请求按名称（如 'history'、'favorites'）登记为
+“脏”，由一个后台线程统一执行：
+- 同一名称在安静期（quiet_ms）内的连续请求合并为一次写入；
+- 一直有新请求时，距第一次请求最多 max_latency_ms 也必然写一次；
+- flush() 立即同步写出全部待写内容（程序退出前调用，保证不丢数据）。
+
+coalesced 统计被合并掉（省下）的写入次数，writes 为成功写入的次数，failures 为
+写入时抛出异常的次数。
+"""
+
+import time
+import threading
+
+
+class WriteBehindPersister:
+    """按名称合并保存请求，在后台线程中执行写入。"""
+
+    def __init__(self, quiet_ms=300, max_latency_ms=2000):
+        self.quiet = quiet_ms / 1000.0
+        self.max_latency = max_latency_ms / 1000.0
+        self._cond = threading.Condition()
+        self._dirty = {}        # name -> [write_fn, 首次请求时间, 最近请求时间]
+        self._writing = 0       # 正在执行的写入数，flush() 需要等它们结束
+        self._thread = None
+        self._stopped = False
+        self.requests = 0
+        self.writes = 0
+        self.failures = 0
+        self.coalesced = 0
+
+    def schedule(self, name, write_fn):
+        """登记一次保存请求；write_fn 会在后台线程中被调用（不带参数）。"""
+        now = time.monotonic()
+        with self._cond:
+            self.requests += 1
+            entry = self._dirty.get(name)
+            if entry is None:
+                self._dirty[name] = [write_fn, now, now]
+            else:
+                self.coalesced += 1
+                entry[0] = write_fn
+                entry[2] = now
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _due_at(self, entry):
+        return min(entry[2] + self.quiet, entry[1] + self.max_latency)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    if not self._dirty:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    due = [name for name, entry in self._dirty.items() if self._due_at(entry) <= now]
+                    if due:
+                        jobs = [self._dirty.pop(name)[0] for name in due]
+                        self._writing += 1
+                        break
+                    self._cond.wait(min(self._due_at(e) for e in self._dirty.values()) - now)
+            try:
+                self._execute(jobs)
+            finally:
+                with self._cond:
+                    self._writing -= 1
+                    self._cond.notify_all()
+
+    def _execute(self, jobs):
+        for write_fn in jobs:
+            try:
+                write_fn()
+            except Exception as e:
+                print(f"后台保存失败: {e}")
+                with self._cond:
+                    self.failures += 1
+                continue
+            with self._cond:
+                self.writes += 1
+
+    def flush(self):
+        """立即在调用线程写出所有待写内容，并等待后台正在进行的写入结束。"""
+        with self._cond:
+            jobs = [entry[0] for entry in self._dirty.values()]
+            self._dirty.clear()
+            while self._writing:
+                self._cond.wait()
+        self._execute(jobs)
+
+    def stop(self):
+        """写出剩余内容并结束后台线程。"""
+        self.flush()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()